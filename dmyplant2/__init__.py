@@ -4,6 +4,7 @@ _validationsfile = '/data/validations.pkl'
 
 from dmyplant2.support import cred
 from dmyplant2.dMyplant import MyPlant, save_json, load_json
+from dmyplant2.dAsyncMyplant import AsyncMyPlant
 from dmyplant2.dValidation import Validation #, HandleID
 from dmyplant2.JFBokeh_Validation_DashBoard import ValidationDashboard
 from dmyplant2.dEngine import Engine
@@ -25,14 +26,21 @@ from dmyplant2.dFSM import (
     FSM, 
     msgFSM, 
     filterFSM, 
+    fleetFSM, 
     FSMPlot_Start,
     get_cycle_data, 
     get_cycle_data2, 
+    load_cycles_data, 
     disp_result,
     disp_alarms,
     disp_warnings,
+    pareto,
     alarms_pareto, 
     warnings_pareto,
     states_lines,
     detect_edge_right, 
-    detect_edge_left)
+    detect_edge_left,
+    edge_right,
+    edge_left,
+    edges_right,
+    edges_left)
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from dmyplant2.dMyplant import decode_batchdata, hist_alarms_url
+
+def run(coro):
+    """run a coroutine to completion from synchronous code
+
+    inside a running event loop (e.g. Jupyter) the coroutine is executed
+    in a separate thread with its own event loop.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+class AsyncMyPlant:
+    """asyncio front end of a MyPlant instance
+
+    The requests share the pooled, authenticated session (token) of mp and run in a
+    thread pool, up to concurrency requests are in flight. rates limits the requests
+    per second per endpoint family ('batchdata', 'alarms', 'asset', 'reports'), None => unlimited.
+    The token buckets of mp (MyPlant.set_rate_limit) apply in addition.
+
+    e.g.:
+    amp = AsyncMyPlant(mp, concurrency=8, rates={'alarms': 5})
+    assets = amp.run(amp.asset_data_many(['1320072', '1145166']))
+    """
+    def __init__(self, mp, concurrency=8, rates=None):
+        self._mp = mp
+        self._concurrency = concurrency
+        self._rates = dict(rates or {})
+        self._next = {}         # endpoint family => earliest start of the next request
+        self._loop = None
+        self._semaphore = None
+        self._executor = None
+
+    def _bind(self):
+        # asyncio primitives belong to the running event loop
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+            self._next = {}
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._concurrency)
+        return loop
+
+    def close(self):
+        """release the worker threads"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def run(self, coro):
+        """run a coroutine of this instance from synchronous code, see run()"""
+        return run(coro)
+
+    async def _throttle(self, endpoint):
+        # evenly spaced request starts per endpoint family
+        rate = self._rates.get(endpoint)
+        if not rate:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next.get(endpoint, 0.0))
+        self._next[endpoint] = slot + 1.0 / rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def login(self):
+        loop = self._bind()
+        await loop.run_in_executor(self._executor, self._mp.login)
+
+    async def fetchraw(self, url, endpoint='asset'):
+        """raw response content of url, see MyPlant.fetchraw"""
+        loop = self._bind()
+        async with self._semaphore:
+            await self._throttle(endpoint)
+            return await loop.run_in_executor(self._executor, self._mp.fetchraw, url)
+
+    async def fetchdata(self, url, endpoint='asset'):
+        """decoded response of url, see MyPlant.fetchdata (response cache included)"""
+        loop = self._bind()
+        async with self._semaphore:
+            await self._throttle(endpoint)
+            return await loop.run_in_executor(self._executor, self._mp.fetchdata, url)
+
+    async def _asset_data(self, serialNumber):
+        return await self.fetchdata(r"/asset?assetType=J-Engine&serialNumber=" + str(serialNumber), 'asset')
+
+    async def historical_dataItem(self, id, itemId, timestamp):
+        return await self.fetchdata(fr"/asset/{id}/dataitem/{itemId}?timestamp={timestamp}", 'asset')
+
+    async def _history_batchdata(self, id, itemIds, lp_from, lp_to, timeCycle=3600):
+        itemIds = { int(k):v for (k,v) in itemIds.items() }
+        IDS = ','.join([str(s) for s in itemIds.keys()])
+        content = await self.fetchraw(
+            fr"/asset/{id}/history/batchdata?from={lp_from}&to={lp_to}&timeCycle={timeCycle}&assetType=J-Engine&includeMinMax=false&forceDownSampling=false&dataItemIds={IDS}",
+            'batchdata')
+        return decode_batchdata(content, itemIds)
+
+    async def batch_hist_alarms(self, assetId, p_severities=[500, 600, 650, 700, 800], p_offset=0, p_limit=None, p_from=None, p_to=None):
+        """see Engine.batch_hist_alarms"""
+        messages = await self.fetchdata(hist_alarms_url(assetId, p_severities, p_offset, p_limit, p_from, p_to), 'alarms')
+        return pd.DataFrame(messages)
+
+    async def oil_reports(self, assetId):
+        return await self.fetchdata(r'/asset/' + str(assetId) + r'/report/Oil', 'reports')
+
+    async def oil_lab_report(self, sampleId, provider):
+        return await self.fetchdata(r'/report/sample/Oil/' + sampleId + r'?provider=' + provider, 'reports')
+
+    async def gather(self, calls):
+        """await {key: coroutine}, failed calls are logged and return None
+
+        Returns:
+            dict: {key: result}
+        """
+        await self.login() # authenticate once, before the requests fan out
+        keys = list(calls)
+        results = await asyncio.gather(*calls.values(), return_exceptions=True)
+        ret = {}
+        for key, res in zip(keys, results):
+            if isinstance(res, Exception):
+                logging.error(f"{key}: {str(res)}")
+                res = None
+            ret[key] = res
+        return ret
+
+    async def asset_data_many(self, serialNumbers):
+        """asset data of many engines, {serialNumber: asset}"""
+        return await self.gather({sn: self._asset_data(sn) for sn in serialNumbers})
+
+    async def hist_alarms_many(self, assetIds, **kwargs):
+        """messages of many engines, {assetId: pd.DataFrame}, kwargs see batch_hist_alarms"""
+        return await self.gather({id: self.batch_hist_alarms(id, **kwargs) for id in assetIds})
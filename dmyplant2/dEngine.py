@@ -4,17 +4,24 @@ from pprint import pprint as pp
 import pandas as pd
 import numpy as np
 from dmyplant2 import _validationsfile
-from dmyplant2.dMyplant import epoch_ts, mp_ts, save_json, load_json, save_pkl, load_pkl
+from dmyplant2.dMyplant import epoch_ts, mp_ts, save_pkl, load_pkl, decode_batchdata, maxdatapoints, hist_alarms_url
 from dmyplant2.dPlot import datastr_to_dict
+from dmyplant2.dHistStore import HistStore, MessageStore
 import sys
 import os
 import pickle
 import logging
 import json
 import arrow
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tqdm.auto import tqdm
 import warnings
 warnings.simplefilter(action='ignore', category=pd.errors.PerformanceWarning)
 
+# serialize access to the local validations database
+_validations_lock = threading.Lock()
+
 class Engine:
     """
     Class to encapsulate Engine properties & methods
@@ -41,6 +48,20 @@ class Engine:
         df = f[f['serialNumber'] == str(sn)]
         return df.to_dict(orient='records')[0]
 
+    @classmethod
+    def asset_data_expired(cls, mp, sn):
+        """True if the Engine instance of sn will fetch its asset data from Myplant,
+        i.e. the local engine cache is missing or older than mp.caching, see MyPlant.preload_assets"""
+        fname = os.getcwd() + f'/data/{str(sn)}/{str(sn)}'
+        if not os.path.exists(fname + '.pkl'):
+            return True
+        try:
+            with open(fname + '.json') as f:
+                last_fetch_date = json.load(f).get('last_fetch_date', None)
+        except (FileNotFoundError, ValueError):
+            return False
+        return last_fetch_date is not None and datetime.now().timestamp() - last_fetch_date > mp.caching
+
     @classmethod
     def _list_cached_validations(cls):
         vfn = os.getcwd() + _validationsfile
@@ -59,7 +80,8 @@ class Engine:
     @classmethod
     def _save_cached_validations(cls, validations):
         vfn = os.getcwd() + _validationsfile
-        save_pkl(vfn, validations)
+        with _validations_lock:
+            save_pkl(vfn, validations)
 
     @classmethod
     def from_fleet(cls, mp, edf, n=0, name=None, valstart=None, oph_start=None, start_start=None, 
@@ -129,12 +151,14 @@ class Engine:
 
         vfn = os.getcwd() + '/data/validations.pkl'
         validations = {}
-        if os.path.exists(vfn):
-            validations = load_pkl(vfn)
-        if validations and ((not eng['serialNumber'] in validations) or (validations[eng['serialNumber']]['source'] != 'from_eng')):
-            eng['source'] = 'from_eng'
-            validations[eng['serialNumber']] = eng
-            save_pkl(vfn, validations)
+        # engines may be constructed in parallel threads, see Validation(workers=...)
+        with _validations_lock:
+            if os.path.exists(vfn):
+                validations = load_pkl(vfn)
+            if validations and ((not eng['serialNumber'] in validations) or (validations[eng['serialNumber']]['source'] != 'from_eng')):
+                eng['source'] = 'from_eng'
+                validations[eng['serialNumber']] = eng
+                save_pkl(vfn, validations)
 
         return cls(
             mp, 
@@ -173,8 +197,7 @@ class Engine:
         self._name = name
         self._data_base = os.getcwd() + f'/data/{str(self._sn)}'
         #self._data_base = os.getcwd() + f'/data/{str(self._sn)}'
-        if not os.path.exists(self._data_base):
-            os.makedirs(self._data_base)        
+        os.makedirs(self._data_base, exist_ok=True)
         self._picklefile = self._fname + '.pkl'    # load persitant data
         self._infofile = self._fname + '.json'
         self._last_fetch_date = None
@@ -288,6 +311,8 @@ class Engine:
             return self._get_xxx(key)
 
     def __getattr__(self,name):
+        if name.startswith('__'): # python internals, e.g. pickle looks up __setstate__ on a bare instance 
+            raise AttributeError(name)
         return self[name]
 
     def _get_keyItem_xxx(self, name):
@@ -645,11 +670,18 @@ class Engine:
 ###########################################
 #improved hist_data ? Dieter, 8.3.2022
 
+    def hist_store(self, timeCycle):
+        """columnar history store of this engine for the given timeCycle"""
+        return HistStore(self._data_base, timeCycle)
+
     def hist_data2(self, itemIds={161: ['CountOph', 'h']}, p_limit=None, p_from=None, p_to=None, timeCycle=86400,
                   assetType='J-Engine', includeMinMax='false', forceDownSampling='false', slot=0, 
                   forceReload=False, debug=False, userfunc=None, silent=False):
         """
         Get pandas dataFrame of dataItems history, either limit or From & to are required
+        the data is cached in the engine's columnar history store (see HistStore),
+        only the time ranges not yet available in the store are downloaded.
+
         ItemIds             dict   e.g. {161: ['CountOph','h']}, dict of dataItems to query.
         p_limit             number of datapoints back from "now".
         p_from              string from iso date or timestamp,
@@ -658,79 +690,26 @@ class Engine:
         assetType           string default 'J-Engine'
         includeMinMax       string 'false'
         forceDownSampling   string 'false'
-        slot                int     dataset differentiator, defaults to 0
+        slot                int     not used anymore, kept for compatibility
         forceReload         bool    force reload of data from Myplant, defaults to False
         """
-
-        def collect_info():
-            # File Metadata
-            info = self._info
-            info['p_from'] = p_from
-            info['p_to'] = p_to
-            info['Timezone'] = 'Europe/Vienna'
-            info['timeCycle'] = timeCycle
-            info['Exported_By'] = self._mp.username
-            info['Export_Date'] = arrow.now().to(
-                'Europe/Vienna').format('DD.MM.YYYY - HH:mm')
-            info['dataItems'] = itemIds
-            return pd.DataFrame.from_dict(info)
-
-        def check_and_loadfile(p_from, fn, itemIds, forceReload):
-            ldf = pd.DataFrame([])
-            last_p_to = p_from
-            if forceReload:
-                if os.path.exists(fn):
-                    os.remove(fn)
-            if os.path.exists(fn):
-                try:
-                    dinfo = pd.read_hdf(fn, "info").to_dict()
-                    # alt: wenn die daten im file den angeforderten daten entsprechen ...
-                    #if set(itemIds) == set(dinfo['dataItems']):
-                    
-                    # neu: wenn die angeforderten Daten im File vorhanden sind, itemIds auf dInfo setzen und die im File vorhandenen Daten ergänzen...
-                    if all([k in dinfo['dataItems'].keys() for k in itemIds ]):
-                        itemIds = dinfo['dataItems']
-                    ###########################################################    
-                        ffrom = list(dinfo['p_from'].values())[0]
-                        if ffrom.to('Europe/Vienna') <= p_from.to('Europe/Vienna'):
-                            ldf = pd.read_hdf(fn, "data")
-                            os.remove(fn)
-                            # Check last lp_to in the file and update the file ....
-                            last_p_to = arrow.get(
-                                list(ldf['time'][-2:-1])[0]).to('Europe/Vienna')
-                            # list(ldf['time'][-2:-1])[0] + timeCycle)
-                            # new starting point ...
-                            if debug:
-                                print(f"\nitemIds: {set(itemIds)}, Shape={ldf.shape}, from: {p_from.format('DD.MM.YYYY - HH:mm')}, to:   {last_p_to.format('DD.MM.YYYY - HH:mm')}, loaded from {fn}")
-                except:
-                    pass
-            return ldf, last_p_to, itemIds
-
         try:
             # make sure itemids have the format { int: [str,str], int: [str,str], ...}
             itemIds = { int(k):v for (k,v) in itemIds.items() }
-            
-            df = pd.DataFrame([])
-            fn = self._fname + fr"_{timeCycle}_{int(slot):02d}.hdf"
-            df, np_from, itemIds = check_and_loadfile(p_from, fn, itemIds, forceReload)
+            p_from = arrow.get(p_from)
+            p_to = arrow.get(p_to)
+            ts_from = int(p_from.timestamp()) * 1000
+            ts_to = int(p_to.timestamp()) * 1000
 
-            np_to = arrow.get(p_to).shift(seconds=-timeCycle)
-            if np_from.to('Europe/Vienna') < np_to.to('Europe/Vienna'):
-                ndf = self._mp.hist_data(
-                    self['id'], itemIds, np_from, p_to, timeCycle, silent=silent)
-
-                # 2022-02-19 pandas Deprecation warning: use pd.concat instead of append.
-                #df = df.append(ndf)
-                df = pd.concat([df,ndf])
+            store = self.hist_store(timeCycle)
+            if forceReload:
+                store.drop(itemIds)
 
-                if debug:
-                    print(f"\nitemIds: {set(itemIds)}, Shape={ndf.shape}, from: {np_from.format('DD.MM.YYYY - HH:mm')}, to:   {p_to.format('DD.MM.YYYY - HH:mm')}, added to {fn}")
+            self._hist_fetch_missing(store, itemIds, [(ts_from, ts_to)], silent=silent, debug=debug)
 
-            df.reset_index(drop=True, inplace=True)
+            # read the requested period & dataItems from the store, merged on 'time'
+            df = store.read(itemIds, ts_from, ts_to)
 
-            dinfo = collect_info()
-            dinfo.to_hdf(fn, "info", complevel=6)
-            df.to_hdf(fn, "data", complevel=6)
             if userfunc:
                 print("Calling user defined function...")
                 df = userfunc(df)
@@ -739,18 +718,82 @@ class Engine:
         except:
             raise ValueError("Engine hist_data2 Error")
 
+    def hist_data2_windows(self, itemIds, windows, timeCycle=1, silent=False, workers=1, max_gap=300):
+        """
+        Get pandas dataFrame of dataItems history for many time windows at once, 
+        e.g. the data of all starts of an engine. Windows less than max_gap apart are 
+        downloaded together, as long as they fit into one Myplant request.
+
+        ItemIds             dict   e.g. {161: ['CountOph','h']}, dict of dataItems to query.
+        windows             list   [(from ms, to ms), ...]
+        timeCycle           int64  interval in seconds.
+        workers             int    number of concurrent requests, defaults to 1 (sequential)
+        max_gap             int    max. gap in seconds between joined windows, the gap is
+                                   downloaded too, defaults to 300 (5 minutes)
+
+        Returns:
+            pd.DataFrame: 'time', <dataItem names> ..., 'datetime', all rows within the windows
+        """
+        itemIds = { int(k):v for (k,v) in itemIds.items() }
+        store = self.hist_store(timeCycle)
+        # timestamps in full seconds, like hist_data2
+        windows = HistStore._merge([((int(a) // 1000) * 1000, (int(b) // 1000) * 1000) for a, b in windows])
+
+        # join close windows, as long as the joined range fits into one request.
+        span = (maxdatapoints // len(itemIds)) * timeCycle * 1000
+        ranges = []
+        for a, b in windows:
+            if ranges and a - ranges[-1][1] <= max_gap * 1000 and b - ranges[-1][0] <= span:
+                ranges[-1][1] = b
+            else:
+                ranges.append([a, b])
+
+        self._hist_fetch_missing(store, itemIds, ranges, silent=silent, workers=workers)
+        return store.read_windows(itemIds, windows)
+
+    def _hist_fetch_missing(self, store, itemIds, ranges, silent=False, workers=1, debug=False):
+        # compute the exact time gaps missing in the store, per dataItem ... 
+        missing = {}
+        for itemId in itemIds:
+            for ts_from, ts_to in ranges:
+                lmissing = store.missing(itemId, ts_from, ts_to)
+                if debug:
+                    print(f"\nitemId: {itemId}, available: {store.intervals(itemId)}, missing: {lmissing}")
+                for window in lmissing:
+                    missing.setdefault(window, {})[itemId] = itemIds[itemId]
+
+        # ... download only the missing dataItems & time gaps, 
+        # dataItems with the same gap are fetched in one request.
+        def _fetch(window):
+            (lfrom, lto), litemIds = window
+            return self._mp.hist_data(
+                self['id'], litemIds, arrow.get(lfrom), arrow.get(lto), store._timeCycle, silent=silent or len(missing) > 1)
+
+        if workers > 1 and len(missing) > 1:
+            self._mp.login()
+            executor = ThreadPoolExecutor(max_workers=workers)
+            results = executor.map(_fetch, missing.items())
+        else:
+            results = map(_fetch, missing.items())
+        pbar = tqdm(total=len(missing), ncols=80, mininterval=1, unit=' requests', desc="Load Data", disable=silent or len(missing) <= 1)
+        for ((lfrom, lto), litemIds), ndf in zip(missing.items(), results):
+            store.append(ndf, litemIds, lfrom, lto)
+            pbar.update(1)
+            if debug:
+                print(f"\nitemIds: {set(litemIds)}, Shape={ndf.shape}, from: {arrow.get(lfrom).to('Europe/Vienna').format('DD.MM.YYYY - HH:mm')}, to:   {arrow.get(lto).to('Europe/Vienna').format('DD.MM.YYYY - HH:mm')}, added to {store._base}")
+        pbar.close()
+        if workers > 1 and len(missing) > 1:
+            executor.shutdown()
+
 ###########################################
 
     def fetch_dataItems(self, ts, items):
         itemIds = self.get_dataItems(items)
         tdj = ','.join([str(s) for s in itemIds])
         url=fr"/asset/{self['id']}/history/batchdata?assetType=J-Engine&from={ts}&to={ts}&dataItemIds={tdj}&timeCycle=30"
-        data =  self._mp.fetchdata(url)
-        dtime = {'timestamp' : [value[0] for value in [data['data'][0]]]}
-        ddata = {itemIds[skey][0]:[value[1][j][0] for value in [data['data'][0]]] for j,skey in enumerate(data['columns'][1])}
-        return pd.DataFrame({**dtime,**ddata})
-        # for python 9.x or higher 
-        return pd.DataFrame(dtime|ddata)
+        content =  self._mp.fetchraw(url)
+        df = decode_batchdata(content, itemIds)
+        return df.iloc[:1].rename(columns={'time':'timestamp'})
 
     def _batch_hist_dataItems(self, itemIds={161: ['CountOph', 'h']}, p_limit=None, p_from=None, p_to=None, timeCycle=3600,
                               assetType='J-Engine', includeMinMax='false', forceDownSampling='false'):
@@ -797,16 +840,10 @@ class Engine:
                 r'&forceDownSampling=' + str(tforceDownSampling)
 
             # fetch data from myplant ....
-            data = self._mp.fetchdata(url)
-
-            # restructure data to dict
-            ds = dict()
-            ds['labels'] = ['time'] + [tdef[x][0] for x in data['columns'][1]]
-            ds['data'] = [[r[0]] + [rr[0] for rr in r[1]]
-                          for r in data['data']]
+            content = self._mp.fetchraw(url)
 
-            # import to Pandas DataFrame
-            df = pd.DataFrame(ds['data'], columns=ds['labels'])
+            # decode to Pandas DataFrame
+            df = decode_batchdata(content, tdef)
             # Addtional Datetime column calculated from timestamp
             df['datetime'] = pd.to_datetime(df['time'] * 1000000)
             return df
@@ -1027,13 +1064,7 @@ class Engine:
     def get_OilReports_Overview(self):
         url = r'/asset/' + str(self['id']) + r'/report/Oil'
         try:
-            try:
-                res = load_json('data/oilreports_raw.json') # for development, avoid frequent downloads
-                print("###### in dengine.getOilReports_Overview => sample Data for Development provided")
-            except FileNotFoundError:
-                res = self._mp.fetchdata(url)
-                save_json('data/oilreports_raw.json', res)
-                print("###### in dengine.getOilReports_Overview => sample Data saved for Development")
+            res = self._mp.fetchdata(url) # per engine, cached by MyPlant
             # Fetch all Oil samples
             nrl = []
             for rep in res:
@@ -1098,14 +1129,7 @@ class Engine:
             r'?provider=' + provider
         rec = dict()
         try:
-            try:
-                sample = load_json(self._fname+'/'+sampleId+'.json')
-                print('.', end='')
-                #print(f"###### in dengine.get_OilLabReport => sample Data for Development provided: {sampleId}")
-            except FileNotFoundError:
-                sample = self._mp.fetchdata(url)
-                #print(f"###### in dengine.get_OilLabReport => sample Data saved for Development: {sampleId}")
-                #save_json(self._fname+'/'+sampleId+'.json', sample)
+            sample = self._mp.fetchdata(url) # cached by MyPlant
             rec['probe.aluminium'] = get_corr(sample,'probe.aluminium', None)  #'2',
             rec['probe.aluminium-alert'] = get_corr(sample,'probe.aluminium-alert', None) # 'G',
             rec['probe.barium'] = get_corr(sample,'probe.barium', None) # '<0.0001',
@@ -1169,59 +1193,72 @@ class Engine:
         return rec
 
 
+    def message_store(self):
+        """persistent message store of this engine"""
+        return MessageStore(self._data_base)
+
     def get_messages(self, p_from=None, p_to=None):
         """load messages ready for the Finite State Mchine Analysis
 
+        all messages are downloaded at the first request and stored in the
+        engine's message store, later requests download only the messages 
+        newer than the stored high water mark.
+
         Args:
             p_from (date, understandable by arrow, optional): first message date. Defaults to very first message.
             p_to (date, understandable by arrow, optional): last message date. Defaults to Now.
 
-        Raises:
-            ValueError: Inform the User/Programmer if 500000 or more messages are available. 
-            Inthis case the constant value needs to be increased in the code of this function. 
-
         Returns:
             pd.DataFrame: Diane Messages.
         """
         # messages consist of the following severities
         sev = [600,650,700,800]
-        # download all available data at the first request and store
-        # to the engine specific pickle file.
-        # check if there is a pickle file, messages are stored as dataframes
-        pfn = self._fname +"_messages.pkl"
-        if os.path.exists(pfn):
-            messages = pd.read_pickle(pfn)    
-            if messages.empty:      # avoid errors with an empty messages dataframe ---
-                os.remove(pfn)
-
-        if not os.path.exists(pfn):
-            # or download the available date and store it otherwise.
-            messages = self.batch_hist_alarms(p_severities=sev, p_limit=500000)
-            if messages.shape[0] >= 500000:
-                raise ValueError('more than 500000 messages, please change the code in dEngine !!!')
-            messages = messages.iloc[::-1] # turn the messages around, so that the oldest message is the first one. 
-            messages.to_pickle(pfn)
-
-        last_ts = int(messages.iloc[-1]['timestamp'])
+        store = self.message_store()
+
+        if store.empty:
+            pfn = self._fname +"_messages.pkl"
+            if os.path.exists(pfn):
+                # take over the messages cached by earlier versions
+                store.append(pd.read_pickle(pfn))
+            else:
+                # download all available messages, page by page
+                store.append(self._paged_hist_alarms(p_severities=sev))
+
         if p_to != None:
             p_to_ts = int(arrow.get(p_to).timestamp() * 1e3)
         else:
             p_to_ts = int(arrow.now().timestamp() * 1e3)
-        if p_to_ts > last_ts: # not all messages are in the pkl file ...
-            new_messages = self.batch_hist_alarms(p_from = last_ts, p_to = p_to_ts)
-            if not new_messages.empty:
-                new_messages = new_messages[::-1] # turn around the response
-                messages.append(new_messages) # and append to existing messages.
-                # do not store the changes for performance reasons.
-        else:
-            messages = messages[messages['timestamp'] <= p_to_ts]
-        
-        if p_from != None:
-            p_from_ts = int(arrow.get(p_from).timestamp() * 1e3)
-            messages = messages[messages['timestamp'] >= p_from_ts]
-
+        hwm = store.hwm
+        if hwm is None or p_to_ts > hwm: # not all messages are in the store ...
+            # messages may arrive late, check the last period before the high water mark again.
+            tail_from = hwm - store._latency * 1000 if hwm is not None else 0
+            store.append(self._paged_hist_alarms(p_severities=sev, p_from=arrow.get(tail_from / 1e3), p_to=arrow.get(p_to_ts / 1e3)))
+
+        p_from_ts = int(arrow.get(p_from).timestamp() * 1e3) if p_from != None else None
+        messages = store.read(p_from_ts, p_to_ts)
         return messages.reset_index()
 
+    def _paged_hist_alarms(self, p_severities, p_from=None, p_to=None, p_pagesize=100000):
+        """download messages in pages of p_pagesize messages
+
+        Returns:
+            pd.DataFrame: messages, oldest message first.
+        """
+        pages = []
+        offset = 0
+        while True:
+            page = self.batch_hist_alarms(p_severities=p_severities, p_offset=offset, p_limit=p_pagesize, p_from=p_from, p_to=p_to)
+            if page.empty:
+                break
+            pages.append(page)
+            if page.shape[0] < p_pagesize:
+                break
+            offset += p_pagesize
+        if not pages:
+            return pd.DataFrame([])
+        # Myplant delivers the newest message first, turn the messages around.
+        return pd.concat(pages, ignore_index=True).iloc[::-1].reset_index(drop=True)
+
     # https://api.myplant.io/api-docs/swagger-ui/index.html?url=https://api.myplant.io/v2/api-docs#/history/historicAlarmsRoute
     def batch_hist_alarms(self, p_severities=[500, 600, 650, 700, 800], p_offset=0, p_limit=None, p_from=None, p_to=None):
         """
@@ -1234,25 +1271,10 @@ class Engine:
         p_limit             int64, number of messages to download
         p_from              string timestamp in milliseconds.
         p_to                string timestamp in milliseconds.
+        limit and from & to can be combined to page through a period.
         """
 
-        tt = r""
-        if p_limit:
-            tt = r"&offset=" + str(p_offset) + \
-                r"&limit=" + str(p_limit)
-        else:
-            if p_from and p_to:
-                tt = r'&from=' + str(int(arrow.get(p_from).timestamp()) * 1000) + \
-                    r'&to=' + str(int(arrow.get(p_to).timestamp()) * 1000)
-            else:
-                raise Exception(
-                    r"batch_hist_alarms, invalid Parameters")
-
-        tsvj = ','.join([str(s) for s in p_severities])
-
-        url = r'/asset/' + str(self['id']) + \
-            r'/history/alarms' + \
-            r'?severities=' + str(tsvj) + tt
+        url = hist_alarms_url(self['id'], p_severities, p_offset, p_limit, p_from, p_to)
 
         # fetch messages from myplant ....
         messages = self._mp.fetchdata(url)
@@ -1,10 +1,16 @@
 from .dFSM import FSM, msgFSM, filterFSM
+from .dFSMFleet import fleetFSM
 from .dFSMResults import (
     detect_edge_right, 
     detect_edge_left,
+    edge_right,
+    edge_left,
+    edges_right,
+    edges_left,
     disp_result ,
     disp_alarms, 
     disp_warnings, 
+    pareto,
     alarms_pareto, 
     warnings_pareto
 )
@@ -12,5 +18,6 @@ from .dFSMPlot import (
     FSMPlot_Start, 
     get_cycle_data, 
     get_cycle_data2, 
+    load_cycles_data, 
     states_lines
 )
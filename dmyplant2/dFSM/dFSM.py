@@ -1,4 +1,5 @@
 import copy
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 import logging
 import os
@@ -14,6 +15,43 @@ from tqdm.auto import tqdm
 
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
+class Message:
+    """lightweight message record built from the columns of the message log
+
+    supports the dict style access of the FSM handlers, e.g. msg['name'].
+    """
+    __slots__ = ('index', 'timestamp', 'name', 'severity', 'message', 'associatedValues')
+
+    def __init__(self, index=None, timestamp=None, name=None, severity=None, message=None, associatedValues=np.nan):
+        self.index = index
+        self.timestamp = timestamp
+        self.name = name
+        self.severity = severity
+        self.message = message
+        self.associatedValues = associatedValues
+
+    # msg['name'] is looked up like an attribute
+    __getitem__ = object.__getattribute__
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def keys(self):
+        return list(self.__slots__)
+
+    def __repr__(self):
+        return f"Message({', '.join(f'{k}={getattr(self, k)!r}' for k in self.__slots__)})"
+
+    @classmethod
+    def from_frame(cls, df):
+        """build records from the column arrays of a message DataFrame"""
+        cols = [df[k].tolist() if k in df.columns else [cls.__init__.__defaults__[i]] * df.shape[0] 
+            for i, k in enumerate(cls.__slots__)]
+        return [cls(*vals) for vals in zip(*cols)]
+
 #Various_Bits_CollAlarm
 class StateVector:
     statechange = False
@@ -54,6 +92,189 @@ currentstate_start: {self.currentstate_start}
                 f"{self.service_selector:6}| " + \
                 f"{self.msg['severity']} {pd.to_datetime(int(self.msg['timestamp'])*1e6).strftime('%d.%m.%Y %H:%M:%S')} {self.msg['name']} {self.msg['message']}"
 
+class RunlogDetail:
+    """compact detail runlog of run1, one row per state vector
+
+    Instead of a copy of every StateVector only the state ids, timestamps, flags
+    and the row index of the message in msgFSM._messages are kept in columns.
+    StateVectors are rebuilt on demand, see vectors().
+    """
+    _columns = ['statechange','startno','laststate','laststate_start','currentstate','currentstate_start','in_operation','service_selector','row','timestamp']
+    _dtypes = [np.bool_, np.int32, np.int16, np.int64, np.int16, np.int64, np.int16, np.int16, np.int64, np.int64]
+
+    def __init__(self):
+        self._strings = []      # interned state names, operation & service selector modes
+        self._string_ids = {}
+        self._data = {c:[] for c in self._columns}
+        self._virtual = {}      # calculated messages, which are not part of the message log
+
+    def __len__(self):
+        return len(self._data['row'])
+
+    def _intern(self, s):
+        sid = self._string_ids.get(s)
+        if sid is None:
+            sid = self._string_ids[s] = len(self._strings)
+            self._strings.append(s)
+        return sid
+
+    def append(self, sv, row=-1):
+        """add a state vector, row is the position of sv.msg in the message log or -1"""
+        d = self._data
+        if not isinstance(d['row'], list):
+            self._data = d = {c:d[c].tolist() for c in self._columns}
+        if row < 0:
+            self._virtual[len(d['row'])] = sv.msg
+        d['statechange'].append(sv.statechange)
+        d['startno'].append(sv.startno)
+        d['laststate'].append(self._intern(sv.laststate))
+        d['laststate_start'].append(sv.laststate_start.value)
+        d['currentstate'].append(self._intern(sv.currentstate))
+        d['currentstate_start'].append(sv.currentstate_start.value)
+        d['in_operation'].append(self._intern(sv.in_operation))
+        d['service_selector'].append(self._intern(sv.service_selector))
+        d['row'].append(row)
+        d['timestamp'].append(int(sv.msg['timestamp']))
+
+    def freeze(self):
+        """convert the columns to numpy arrays"""
+        self._data = {c:np.asarray(self._data[c], dtype=t) for c,t in zip(self._columns, self._dtypes)}
+
+    def select(self, ts_from=None, ts_to=None, statechanges_only=False):
+        """positions of the state vectors with message timestamps in [ts_from, ts_to] (ms)"""
+        ts = np.asarray(self._data['timestamp'], dtype=np.int64)
+        mask = np.ones(ts.shape, dtype=bool)
+        if ts_from is not None:
+            mask &= ts >= ts_from
+        if ts_to is not None:
+            mask &= ts <= ts_to
+        if statechanges_only:
+            mask &= np.asarray(self._data['statechange'], dtype=bool)
+        return np.flatnonzero(mask)
+
+    def vector(self, i, messages):
+        """rebuild the StateVector at position i, messages is the message log as list of records"""
+        d = self._data
+        sv = StateVector()
+        sv.statechange = bool(d['statechange'][i])
+        sv.startno = int(d['startno'][i])
+        sv.laststate = self._strings[d['laststate'][i]]
+        sv.laststate_start = pd.Timestamp(int(d['laststate_start'][i]))
+        sv.currentstate = self._strings[d['currentstate'][i]]
+        sv.currentstate_start = pd.Timestamp(int(d['currentstate_start'][i]))
+        sv.in_operation = self._strings[d['in_operation'][i]]
+        sv.service_selector = self._strings[d['service_selector'][i]]
+        row = int(d['row'][i])
+        sv.msg = messages[row] if row >= 0 else self._virtual[i]
+        return sv
+
+    def vectors(self, messages, index=None):
+        """generator, rebuild the StateVectors at positions index (default all)"""
+        index = range(len(self)) if index is None else index
+        for i in index:
+            yield self.vector(i, messages)
+
+
+class ResultTable:
+    """columnar run1/run2 result table, one row per start, stop, timing segment or alarm
+
+    The columns are lists while run1 appends rows, freeze() converts them to numpy arrays.
+    Timestamps are stored as int64 ns, strings are interned and stored as codes.
+    frame() builds the DataFrame once, it is cached until the table changes.
+    """
+    def __init__(self, spec):
+        self._spec = spec       # [(column, dtype, default), ...], dtype 'str' => interned, 'M8[ns]' => timestamps
+        self._dtypes = {c:t for c,t,_ in spec}
+        self._strings = {}      # column => interned strings
+        self._string_ids = {}
+        self._data = {c:[] for c,_,_ in spec}
+        self._frame = None
+
+    def __len__(self):
+        return len(self._data[self._spec[0][0]])
+
+    def __contains__(self, column):
+        return column in self._data
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_frame'] = None
+        return state
+
+    @property
+    def columns(self):
+        return [c for c,_,_ in self._spec]
+
+    def _intern(self, column, s):
+        ids = self._string_ids.setdefault(column, {})
+        sid = ids.get(s)
+        if sid is None:
+            strings = self._strings.setdefault(column, [])
+            sid = ids[s] = len(strings)
+            strings.append(s)
+        return sid
+
+    def _encode(self, column, dtype, value):
+        if dtype == 'str':
+            return self._intern(column, value)
+        if dtype == 'M8[ns]':
+            return pd.Timestamp(value).value
+        return value
+
+    def append(self, **values):
+        """add a row, missing columns get the default of the column spec"""
+        d = self._data
+        if not isinstance(d[self._spec[0][0]], list):
+            self._data = d = {c:d[c].tolist() for c in d}
+        for c, t, default in self._spec:
+            d[c].append(self._encode(c, t, values.get(c, default)))
+        self._frame = None
+
+    def set(self, i, column, value):
+        """set a single value, negative i count from the end"""
+        self._data[column][i] = self._encode(column, self._dtypes[column], value)
+        self._frame = None
+
+    def get(self, i, column):
+        t = self._dtypes[column]
+        v = self._data[column][i]
+        if t == 'str':
+            return self._strings[column][v]
+        if t == 'M8[ns]':
+            return pd.Timestamp(int(v))
+        return v
+
+    def array(self, column):
+        """column as numpy array, timestamps as int64 ns and strings as codes"""
+        t = self._dtypes[column]
+        dtype = np.int32 if t == 'str' else np.int64 if t == 'M8[ns]' else t
+        return np.asarray(self._data[column], dtype=dtype)
+
+    def strings(self, column):
+        """interned strings of column, indexed by the codes"""
+        return list(self._strings.get(column, []))
+
+    def freeze(self):
+        """convert the columns to numpy arrays"""
+        self._data = {c:self.array(c) for c,_,_ in self._spec}
+
+    def frame(self):
+        """the table as DataFrame, cached until the next change - don't modify it in place."""
+        if self._frame is None:
+            cols = {}
+            for c, t, _ in self._spec:
+                if t == 'str':
+                    cols[c] = pd.Categorical.from_codes(self.array(c), categories=self.strings(c))
+                elif t == 'M8[ns]':
+                    cols[c] = self.array(c).view('datetime64[ns]')
+                elif t == object:
+                    cols[c] = np.empty(len(self), dtype=object)
+                    cols[c][:] = self._data[c]
+                else:
+                    cols[c] = self.array(c)
+            self._frame = pd.DataFrame(cols)
+        return self._frame
+
 
 # States und Transferfunktionen, Sammeln von Statebezogenen Daten ... 
 class State:
@@ -61,6 +282,8 @@ class State:
         self._statename = statename
         self._transferfunctions = transferfun_list
         self._trigger = False
+        self._row = None        # compiled transitions, new state per message code id, see FSM._compile
+        self._state_names = None
     
     def send(self,msg):
         for transfun in self._transferfunctions: # screen triggers
@@ -69,14 +292,27 @@ class State:
                 return transfun['new-state']
         return self._statename
 
+    def send_code(self, code):
+        # lookup in the compiled transition table, -1 => no transition 
+        new_state = self._row[code]
+        self._trigger = new_state >= 0
+        return self._state_names[new_state] if self._trigger else self._statename
+
     def update_vector_on_statechange(self, vector):
         vector.laststate = self._statename
         vector.laststate_start = vector.currentstate_start
-        vector.currentstate_start = pd.to_datetime(vector.msg['timestamp'] * 1e6)
+        vector.currentstate_start = pd.Timestamp(vector.msg['timestamp'] * 1e6)
         return vector        
 
-    def trigger_on_vector(self, vector):
-        vector.currentstate = self.send(vector.msg)
+    def checkpoint(self):
+        """internal data, required to continue a run later on"""
+        return {}
+
+    def restore_checkpoint(self, checkpoint):
+        pass
+
+    def trigger_on_vector(self, vector, code=None):
+        vector.currentstate = self.send(vector.msg) if code is None else self.send_code(code)
         vector.statechange = self._trigger
         if self._trigger:
             vector = self.update_vector_on_statechange(vector)
@@ -91,9 +327,15 @@ class LoadrampState(State):
         self._default_ramp_duration = 100.0 / self._loadramp
         super().__init__(statename, transferfun_list)
 
-    def trigger_on_vector(self, vector):
+    def checkpoint(self):
+        return {'full_load_timestamp': self._full_load_timestamp}
+
+    def restore_checkpoint(self, checkpoint):
+        self._full_load_timestamp = checkpoint.get('full_load_timestamp', None)
+
+    def trigger_on_vector(self, vector, code=None):
         #print(vector)
-        vectorlist = super().trigger_on_vector(vector)
+        vectorlist = super().trigger_on_vector(vector, code)
         vector = vectorlist[0]
 
         # one of the triggerfunctions has already changed state. 
@@ -118,11 +360,11 @@ class LoadrampState(State):
                 vector2.currentstate = 'targetoperation'
                 
                 # copy state vector, fill out the relevant data and trigger to tagetopeartion
-                vector1 = copy.deepcopy(vector2)
-                vector1.msg = {'name':'9047', 'message':'Target load reached (calculated)','timestamp':self._full_load_timestamp,'severity':600}
+                vector1 = copy.copy(vector2)
+                vector1.msg = Message(name='9047', message='Target load reached (calculated)', timestamp=self._full_load_timestamp, severity=600)
                 vector1.statechange = True
                 vector1.currentstate = 'targetoperation'
-                vector1.currentstate_start = pd.to_datetime(self._full_load_timestamp * 1e6)
+                vector1.currentstate_start = pd.Timestamp(self._full_load_timestamp * 1e6)
 
                 # Reset the State for the next event.
                 self._full_load_timestamp = None
@@ -184,6 +426,41 @@ class FSM:
                     { 'trigger':'1231 Request module on', 'new-state': 'startpreparation'},            
                 ])
             }
+        self._compile()
+
+    def _compile(self):
+        """compile the states into an integer coded transition table
+
+        rows are state ids, columns message code ids, the entries hold the new state id
+        or -1 if the message doesn't trigger a transition. Message code id 0 collects all 
+        messages without any transition. The first matching trigger of a state wins.
+        """
+        self._state_names = list(self._states.keys())
+        self._state_ids = {s:i for i,s in enumerate(self._state_names)}
+        self._codes = {'': 0}
+        for state in self._states.values():
+            for t in state._transferfunctions:
+                self._codes.setdefault(t['trigger'][:4], len(self._codes))
+        self._table = np.full((len(self._state_names), len(self._codes)), -1, dtype=np.int16)
+        for s, state in self._states.items():
+            row = self._table[self._state_ids[s]]
+            for t in state._transferfunctions:
+                code = self._codes[t['trigger'][:4]]
+                if row[code] < 0:
+                    row[code] = self._state_ids[t['new-state']]
+            state._row = row.tolist()
+            state._state_names = self._state_names
+
+    def encode(self, names):
+        """intern message names into message code ids of the transition table
+
+        Args:
+            names (iterable): message names, e.g. the 'name' column of the messages
+
+        Returns:
+            np.ndarray: message code ids, 0 for messages without a transition
+        """
+        return pd.Series(names, dtype=object).map(self._codes).fillna(0).to_numpy(dtype=np.int16)
 
     @property
     def initial_state(self):
@@ -193,6 +470,18 @@ class FSM:
     def states(self):
         return self._states
 
+    @property
+    def state_names(self):
+        return self._state_names
+
+    @property
+    def codes(self):
+        return self._codes
+
+    @property
+    def table(self):
+        return self._table
+
     def dot(self, fn):
         """Create a FSM Diagram of specified states in *.dot Format
         Args:
@@ -215,68 +504,144 @@ class filterFSM:
     vertical_lines_times = ['startpreparation','starter','speedup','idle','synchronize','loadramp','targetoperation','rampdown','coolrun','runout']
 
 class msgFSM:
+    # column specs of the result tables, see ResultTable
+    _starts_spec = [
+        ('run2', np.bool_, False), ('no', np.int32, 0), ('success', np.bool_, False), ('mode', 'str', '???'),
+        ('starttime', 'M8[ns]', 0), ('endtime', 'M8[ns]', 0), ('cumstarttime', np.float64, 0.0)] + \
+        [(ph, np.float64, np.nan) for ph in filterFSM.vertical_lines_times] + [
+        ('maxload', np.float64, np.nan), ('ramprate', np.float64, np.nan),
+        ('count_alarms', np.int32, 0), ('count_warnings', np.int32, 0),
+        ('title', object, None), ('backup', object, None)]
+    _stops_spec = [
+        ('run2', np.bool_, False), ('no', np.int32, 0), ('mode', 'str', '???'),
+        ('starttime', 'M8[ns]', 0), ('endtime', 'M8[ns]', 0),
+        ('count_alarms', np.int32, 0), ('count_warnings', np.int32, 0)]
+    # phase segments of the starts, 'no' refers to the starts table
+    _timing_spec = [('no', np.int32, 0), ('phase', 'str', ''), ('start', 'M8[ns]', 0), ('end', 'M8[ns]', 0)]
+    # alarms (800) & warnings (700), 'no' refers to the starts or stops table, see 'cycle'
+    _alarms_spec = [
+        ('cycle', 'str', 'stops'), ('no', np.int32, 0), ('state', 'str', ''), ('severity', np.int16, 0),
+        ('timestamp', 'M8[ns]', 0), ('name', 'str', ''), ('message', 'str', '')]
+
     def __init__(self, e, p_from = None, p_to=None, skip_days=None, frompickle='NOTIMPLEMENTED',successtime=600):
         self._e = e
         self._successtime = successtime
+        fsmStates = FSM(self._e)
+        self._fsm = fsmStates
         self.load_messages(e, p_from, p_to, skip_days)
         self._pre_period = 5*60 #sec 'prerun' in data download Start before cycle start event.
         self._post_period = 21*60 #sec 'postrun' in data download Start after cycle stop event.
         #self._pre_period = 0 #sec 'prerun' in data download Start before cycle start event.
         #self._post_period = 0 #sec 'postrun' in data download Start after cycle stop event.
 
-        fsmStates = FSM(self._e)
-        fsmStates.dot('FSM.dot')
         self.states = fsmStates.states
 
+        self.init_svec()
+
+        self.pfn = self._e._fname + '_statemachine.pkl'
+        self._checkpoint = None
+        #self._runlog = []
+        #self._runlogdetail = []
+        self.init_results()
+
+    def dot(self, fn='FSM.dot'):
+        """write the FSM diagram in *.dot format, see FSM.dot"""
+        self._fsm.dot(fn)
+
+    def init_svec(self):
+        # FSM statusvector & state data at the first message
         self.svec = StateVector()
         self.svec.statechange = True
         self.svec.laststate = 'init'
         self.svec.laststate_start = self.first_message
-        self.svec.currentstate = fsmStates.initial_state
+        self.svec.currentstate = self._fsm.initial_state
         self.svec.currentstate_start = self.first_message
         self.svec.in_operation = 'off'
         self.svec.service_selector = '???'
-
-        self.pfn = self._e._fname + '_statemachine.pkl'
-        #self._runlog = []
-        #self._runlogdetail = []
-        self.init_results()
+        for state in self.states.values():
+            state.restore_checkpoint({})
 
     def init_results(self):
         self.results = {
-            'starts': [],
+            'starts': ResultTable(self._starts_spec),
             'starts_counter':0,
-            'stops': [
-            {
-                'run2':False,
-                'no': 0,
-                'mode': self.svec.service_selector,
-                'starttime': self.svec.laststate_start,
-                'endtime': pd.Timestamp(0),
-                'alarms':[],
-                'warnings':[]                
-            }],
+            'successful_starts':0,
+            'stops': ResultTable(self._stops_spec),
             'stops_counter':0,
+            'timing': ResultTable(self._timing_spec),
+            'alarms': ResultTable(self._alarms_spec),
             'runlog': [],
-            'runlogdetail': []
+            'runlogdetail': RunlogDetail()
         }     
+        self.results['stops'].append(no=0, mode=self.svec.service_selector, starttime=self.svec.laststate_start)
 
     @property
     def starts(self):
-        return pd.DataFrame(self.results['starts'])
+        """starts table, cached DataFrame - don't modify it in place"""
+        return self.results['starts'].frame()
 
     @property
     def stops(self):
-        return pd.DataFrame(self.results['stops'])
+        """stops table, cached DataFrame - don't modify it in place"""
+        return self.results['stops'].frame()
+
+    @property
+    def timing(self):
+        """phase segments of the starts, column no refers to the starts table"""
+        return self.results['timing'].frame()
+
+    @property
+    def alarms(self):
+        """alarms (severity 800) and warnings (700), columns cycle & no refer to the starts or stops table"""
+        return self.results['alarms'].frame()
+
+    def _legacy_results(self, results):
+        # results stored by earlier versions, lists of dicts per start & stop => ResultTables
+        legacy = results
+        results = {k:v for k,v in legacy.items() if k not in ['starts','stops']}
+        results['starts'] = ResultTable(self._starts_spec)
+        results['stops'] = ResultTable(self._stops_spec)
+        results['timing'] = ResultTable(self._timing_spec)
+        results['alarms'] = ResultTable(self._alarms_spec)
+        for key in ['starts','stops']:
+            table = results[key]
+            for rec in legacy[key]:
+                values = {k:v for k,v in rec.items() if k in table and v is not None}
+                if isinstance(values.get('cumstarttime'), pd.Timedelta):
+                    values['cumstarttime'] = values['cumstarttime'].total_seconds()
+                values['count_alarms'] = len(rec.get('alarms', []))
+                values['count_warnings'] = len(rec.get('warnings', []))
+                table.append(**values)
+                timing = dict(rec.get('timing', {}))
+                if 'targetoperation_org' in timing:
+                    timing['targetoperation'] = timing.pop('targetoperation_org')
+                for phase, segments in timing.items():
+                    for seg in segments:
+                        results['timing'].append(no=rec['no'], phase=phase, start=seg['start'], end=seg['end'])
+                for al in sorted(rec.get('alarms', []) + rec.get('warnings', []), key=lambda x:int(x['msg']['timestamp'])):
+                    msg = al['msg']
+                    results['alarms'].append(cycle=key, no=rec['no'], state=al['state'], severity=msg['severity'],
+                        timestamp=int(msg['timestamp']) * 1000000, name=msg['name'], message=msg['message'])
+        for key in ['starts','stops','timing','alarms']:
+            results[key].freeze()
+        return results
 
     def restore(self):
         with open(self.pfn, 'rb') as handle:
-            self.results = pickle.load(handle)
+            data = pickle.load(handle)
+        if 'checkpoint' in data and 'results' in data:
+            self.results = data['results']
+            self._checkpoint = data['checkpoint']
+        else: # stored by earlier versions, results only.
+            self.results = data
+            self._checkpoint = None
+        if isinstance(self.results['starts'], list):
+            self.results = self._legacy_results(self.results)
 
     def store(self):
         self.unstore()
         with open(self.pfn, 'wb') as handle:
-            pickle.dump(self.results, handle, protocol=4)
+            pickle.dump({'results': self.results, 'checkpoint': self._checkpoint}, handle, protocol=4)
 
     def unstore(self):
         if os.path.exists(self.pfn):
@@ -296,6 +661,9 @@ class msgFSM:
             self.first_message = pd.Timestamp(arrow.get(self.first_message).shift(days=skip_days).timestamp()*1e9)
             self._messages = self._messages[self._messages['timestamp'] > int(arrow.get(self.first_message).shift(days=skip_days).timestamp()*1e3)]
         self.count_messages = self._messages.shape[0]
+        # intern the message codes once, run1 dispatches on the compiled transition table.
+        self._msg_codes = self._fsm.encode(self._messages['name'])
+        self._records = None
 
     def msgtxt(self, msg, idx=0):
         return f"{idx:>06} {msg['severity']} {msg['timestamp']} {pd.to_datetime(int(msg['timestamp'])*1e6).strftime('%d.%m.%Y %H:%M:%S')}  {msg['name']} {msg['message']}"
@@ -305,12 +673,11 @@ class msgFSM:
 
     def save_messages(self, fn):
         with open(fn, 'w') as f:
-            for index, msg in self._messages.iterrows():
+            for index, msg in zip(self._messages.index, self._message_records()):
                 f.write(self.msgtxt(msg, index)+'\n')
                 #f.write(f"{index:>06} {msg['severity']} {msg['timestamp']} {pd.to_datetime(int(msg['timestamp'])*1e6).strftime('%d.%m.%Y %H:%M:%S')}  {msg['name']} {msg['message']}\n")
-                if 'associatedValues' in msg:
-                    if msg['associatedValues'] == msg['associatedValues']:  # if not NaN ...
-                        f.write(f"{pf(msg['associatedValues'])}\n\n")
+                if msg['associatedValues'] == msg['associatedValues']:  # if not NaN ...
+                    f.write(f"{pf(msg['associatedValues'])}\n\n")
 
     def save_runlog(self, fn):
         if len(self._runlog):
@@ -318,21 +685,29 @@ class msgFSM:
                 for line in self._runlog:
                     f.write(line + '\n')
 
+    def _message_records(self):
+        # the message log as list of records, positions match the row index in the detail runlog
+        if self._records is None:
+            self._records = Message.from_frame(self._messages)
+        return self._records
+
+    def _detailvectors(self, ts_start=None, ts_end=None, statechanges_only=False):
+        log = self.results['runlogdetail']
+        if isinstance(log, list): # results stored by earlier versions hold the StateVectors 
+            return [x for x in log if (not statechanges_only or x.statechange) and 
+                (ts_start is None or x.msg['timestamp'] >= ts_start) and (ts_end is None or x.msg['timestamp'] <= ts_end)]
+        return log.vectors(self._message_records(), log.select(ts_start, ts_end, statechanges_only))
+
     def save_detailrunlog(self, fn):
         if len(self.results['runlogdetail']):
             with open(fn, 'w') as f:
-                for vec in self.results['runlogdetail']:
+                for vec in self._detailvectors():
                     f.write(vec.__str__() + '\n')
 
     def runlogdetail(self, startversuch, statechanges_only = False):
         ts_start = startversuch['starttime'].timestamp() * 1e3
         ts_end = startversuch['endtime'].timestamp() * 1e3
-        if statechanges_only:
-            log = [x for x in self.results['runlogdetail'] if x.statechange]
-        else:
-            log = self.results['runlogdetail']
-        log = [x for x in log if ((x.msg['timestamp'] >= ts_start) and (x.msg['timestamp'] <= ts_end))]
-        return log
+        return list(self._detailvectors(ts_start, ts_end, statechanges_only))
 
 #################################################################################################################
 ### die Finite State Machines:
@@ -345,98 +720,71 @@ class msgFSM:
             self.svec.service_selector = 'AUTO'
 
     def _fsm_collect_alarms(self):
-        key = 'starts' if self.svec.in_operation == 'on' else 'stops'
-        if self.svec.msg['severity'] == 800:
-            self.results[key][-1]['alarms'].append({
-                'state':self.svec.currentstate, 
-                'msg': self.svec.msg
-                })
-        if self.svec.msg['severity'] == 700:
-            self.results[key][-1]['warnings'].append({
-                'state':self.svec.currentstate, 
-                'msg': self.svec.msg
-                })
+        severity = self.svec.msg['severity']
+        if severity == 800 or severity == 700:
+            key = 'starts' if self.svec.in_operation == 'on' else 'stops'
+            table = self.results[key]
+            msg = self.svec.msg
+            self.results['alarms'].append(
+                cycle=key, no=table.get(-1, 'no'), state=self.svec.currentstate, severity=severity,
+                timestamp=int(msg['timestamp']) * 1000000, name=msg['name'], message=msg['message'])
+            count = 'count_alarms' if severity == 800 else 'count_warnings'
+            table.set(-1, count, table.get(-1, count) + 1)
+
+    def _phase_durations(self, no):
+        # phase durations [s] of start no from the timing table, the last segment of each phase counts,
+        # targetoperation from the begin of the first to the end of the last segment.
+        timing = self.results['timing']
+        first = len(timing)
+        while first > 0 and timing.get(first - 1, 'no') == no:
+            first -= 1
+        segments = {}
+        for i in range(first, len(timing)):
+            phase = timing.get(i, 'phase')
+            start, end = timing.get(i, 'start'), timing.get(i, 'end')
+            segments[phase] = (segments[phase][0] if phase in segments else start, start, end)
+        return { ph:pd.Timedelta(end - (first_start if ph == 'targetoperation' else start)).total_seconds() 
+                for ph, (first_start, start, end) in segments.items()}
 
     def _fsm_Operating_Cycle(self):
         if self.svec.statechange:
+            starts = self.results['starts']
             if self.svec.currentstate == 'startpreparation':
-                self.results['stops'][-1]['endtime'] = self.svec.currentstate_start
-                self.results['stops'][-1]['count_alarms'] = len(self.results['stops'][-1]['alarms'])
-                self.results['stops'][-1]['count_warnings'] = len(self.results['stops'][-1]['warnings'])
-                # apends a new record to the Starts list.
-                self.results['starts'].append({
-                    'run2':False,
-                    'no':self.results['starts_counter'],
-                    'success': False,
-                    'mode':self.svec.service_selector,
-                    'starttime': self.svec.currentstate_start,
-                    'endtime': pd.Timestamp(0),
-                    'cumstarttime': pd.Timedelta(0),
-                    'startpreparation':np.nan,
-                    'starter':np.nan,
-                    'speedup':np.nan,
-                    'idle':np.nan,
-                    'synchronize':np.nan,
-                    'loadramp':np.nan,
-                    'targetoperation':np.nan,
-                    'rampdown':np.nan,
-                    'coolrun':np.nan,
-                    'runout':np.nan,
-                    'timing': {},
-                    'alarms': [],
-                    'warnings': [],
-                    'maxload': np.nan,
-                    'ramprate': np.nan
-                })
+                self.results['stops'].set(-1, 'endtime', self.svec.currentstate_start)
+                # apends a new record to the Starts table.
+                starts.append(
+                    no=self.results['starts_counter'],
+                    mode=self.svec.service_selector,
+                    starttime=self.svec.currentstate_start)
                 self.results['starts_counter'] += 1 # index for next start
                 self.svec.startno = self.results['starts_counter']
                 self.svec.in_operation = 'on'
             elif self.svec.in_operation == 'on': # and actstate != FSM.initial_state:
-                self.results['starts'][-1]['mode'] = self.svec.service_selector
-                rec = {'start':self.svec.laststate_start, 'end':self.svec.currentstate_start}
-                if not self.svec.laststate in self.results['starts'][-1]['timing']:
-                    self.results['starts'][-1]['timing'][self.svec.laststate]=[rec]
-                else:
-                    self.results['starts'][-1]['timing'][self.svec.laststate].append(rec)
-                #self.results['starts'][-1]['timing']['start_'+ self.svec.laststate] = self.svec.laststate_start 
-                #self.results['starts'][-1]['timing']['end_'+ self.svec.laststate] = self.svec.currentstate_start 
+                starts.set(-1, 'mode', self.svec.service_selector)
+                self.results['timing'].append(
+                    no=starts.get(-1, 'no'), phase=self.svec.laststate,
+                    start=self.svec.laststate_start, end=self.svec.currentstate_start)
 
             if self.svec.currentstate == 'standstill':
                 if self.svec.in_operation == 'on':
                     # start finished
-                    self.results['starts'][-1]['endtime'] = self.svec.currentstate_start
+                    starts.set(-1, 'endtime', self.svec.currentstate_start)
                     # calc phase durations
-                    sv = self.results['starts'][-1]
-                    # phases = [x[6:] for x in self.results['starts'][-1]['timing'] if x.startswith('start_')]
-                    phases = list(sv['timing'].keys())
-
-                    # some sense checks, mostly for commissioning or Test cycles 
-                    if 'targetoperation' in phases:
-                        tlr = sv['timing']['targetoperation']
-                        tlr = [{'start':tlr[0]['start'], 'end':tlr[-1]['end']}]
-                        sv['timing']['targetoperation_org'] = sv['timing']['targetoperation']
-                        sv['timing']['targetoperation'] = tlr
-                    # durations = { ph:pd.Timedelta(self.results['starts'][-1]['timing']['end_'+ph] - self.results['starts'][-1]['timing']['start_'+ph]).total_seconds() for ph in phases}
-                    durations = { ph:pd.Timedelta(sv['timing'][ph][-1]['end'] - sv['timing'][ph][-1]['start']).total_seconds() for ph in phases}
+                    durations = self._phase_durations(starts.get(-1, 'no'))
                     durations['cumstarttime'] = sum([v for k,v in durations.items() if k in ['startpreparation','starter','speedup','idle','synchronize','loadramp']])
-                    self.results['starts'][-1].update(durations)
-                    if 'targetoperation' in self.results['starts'][-1]:
-                        #successful if the targetoperation run was longer than specified
-                        self.results['starts'][-1]['success'] = (self.results['starts'][-1]['targetoperation'] > self._successtime)
-                    self.results['starts'][-1]['count_alarms'] = len(self.results['starts'][-1]['alarms'])
-                    self.results['starts'][-1]['count_warnings'] = len(self.results['starts'][-1]['warnings'])
+                    for k, v in durations.items():
+                        starts.set(-1, k, v)
+                    #successful if the targetoperation run was longer than specified
+                    success = bool(starts.get(-1, 'targetoperation') > self._successtime)
+                    starts.set(-1, 'success', success)
+                    self.results['successful_starts'] += int(success)
  
                 self.svec.in_operation = 'off'
                 self.results['stops_counter'] += 1 # index for next start
-                self.results['stops'].append({
-                    'run2':False,
-                    'no': self.results['stops_counter'],
-                    'mode': self.svec.service_selector,
-                    'starttime': self.svec.laststate_start,
-                    'endtime': pd.Timestamp(0),
-                    'alarms':[],
-                    'warnings':[]
-                })
+                self.results['stops'].append(
+                    no=self.results['stops_counter'],
+                    mode=self.svec.service_selector,
+                    starttime=self.svec.laststate_start)
 
             _logline= {
                 'laststate': self.svec.laststate,
@@ -445,28 +793,75 @@ class msgFSM:
                 'currenstate': self.svec.currentstate,
                 'currentstate_start': self.svec.currentstate_start,
                 'starts': len(self.results['starts']),
-                'Successful_starts': len([s for s in self.results['starts'] if s['success']]),
+                'Successful_starts': self.results['successful_starts'],
                 'operation': self.svec.in_operation,
                 'mode': self.svec.service_selector,
             }
             self.results['runlog'].append(_logline)
 
-    def call_trigger_states(self):
-        return self.states[self.svec.currentstate].trigger_on_vector(self.svec)
+    def call_trigger_states(self, code=None):
+        return self.states[self.svec.currentstate].trigger_on_vector(self.svec, code)
 
     ## FSM Entry Point.
     def run1(self, enforce=False, silent=False):
-        if len(self.results['starts']) == 0 or enforce or not ('run2' in self.results['starts'][0]):
-            self.init_results()
-
-            if silent:
-                for i, msg in self._messages.iterrows():
-                    self.dorun1(msg)
+        """run the FSM over the messages
 
-            else:
-                #tqdm disturbes the VSC Debugger - disable for debug purposes please.     
-                for i,msg in tqdm(self._messages.iterrows(), total=self._messages.shape[0], ncols=80, mininterval=1, unit=' messages', desc="FSM"):
-                    self.dorun1(msg)
+        results restored from an earlier run are continued from the stored checkpoint,
+        only the messages after the checkpoint are processed. Without a matching checkpoint,
+        e.g. late messages inserted before it, or enforce=True all messages are replayed.
+        """
+        start = None if len(self.results['starts']) == 0 or enforce else self._resume()
+        if start is None:
+            self.init_svec()
+            self.init_results()
+            self._run1(0, silent)
+        elif start < self.count_messages:
+            self._run1(start, silent)
+
+    def _resume(self):
+        # position of the first message after the checkpoint, None if the run cannot be continued.
+        cp = self._checkpoint
+        if cp is None:
+            return None
+        pos = cp['position']
+        ts = self._messages['timestamp'].values
+        if pos == 0 or pos > self.count_messages or ts[0] != cp['first_timestamp'] or ts[pos-1] != cp['last_timestamp']:
+            logging.warning(f"{self._e} FSM checkpoint doesn't match the loaded messages, replay all messages")
+            return None
+        self.svec = copy.copy(cp['svec'])
+        for name, state in self.states.items():
+            state.restore_checkpoint(cp['states'].get(name, {}))
+        return pos
+
+    def _run1(self, start, silent):
+        msgs = self._message_records()
+        codes = self._msg_codes.tolist()
+        states = [self.states[s] for s in self._fsm.state_names]
+        state_ids = {s:i for i,s in enumerate(self._fsm.state_names)}
+        lstate = states[state_ids[self.svec.currentstate]]
+
+        #tqdm disturbes the VSC Debugger - disable for debug purposes please.     
+        index = range(start, self.count_messages)
+        if not silent:
+            index = tqdm(index, total=len(index), ncols=80, mininterval=1, unit=' messages', desc="FSM")
+        for i in index:
+            msg = msgs[i]
+            self.svec.msg = msg
+            self.dorun1_vectors(lstate.trigger_on_vector(self.svec, codes[i]), i, msg)
+            if self.svec.currentstate != lstate._statename:
+                lstate = states[state_ids[self.svec.currentstate]]
+        for key in ['starts','stops','timing','alarms','runlogdetail']:
+            self.results[key].freeze()
+
+        # remember where to continue with the next messages.
+        if self.count_messages:
+            self._checkpoint = {
+                'position': self.count_messages,
+                'first_timestamp': int(msgs[0]['timestamp']),
+                'last_timestamp': int(msgs[-1]['timestamp']),
+                'svec': copy.copy(self.svec),
+                'states': {name:state.checkpoint() for name, state in self.states.items()}
+            }
 
                 # # the FSM statusvector is called self.svec
                 # self.svec.msg = msg
@@ -481,11 +876,13 @@ class msgFSM:
     
     def dorun1(self, msg):
         self.svec.msg = msg
-        retsv = self.call_trigger_states()
+        self.dorun1_vectors(self.call_trigger_states())
+
+    def dorun1_vectors(self, retsv, row=-1, msg=None):
         for sv in retsv:   
             self.svec = sv
             #print(f"{len(self.results['runlogdetail']):5} {sv}")
-            self.results['runlogdetail'].append(copy.deepcopy(sv))
+            self.results['runlogdetail'].append(sv, row if sv.msg is msg else -1)
             self._fsm_Service_selector()
             self._fsm_collect_alarms()
             self._fsm_Operating_Cycle()
@@ -507,87 +904,123 @@ class msgFSM:
 
 
 #********************************************************
-    def dorun2(self, index_list, startversuch):
+    def _run2_input(self, startversuch, cycles_data=None):
+        # the run2 input of one start, sliced to plain numpy arrays
+        data = dmyplant2.get_cycle_data2(self, startversuch, max_length=None, min_length=None, silent=True, cycles_data=cycles_data)
+        if data.empty:
+            return None
+        return (
+            startversuch['starttime'],
+            [v for v in startversuch[filterFSM.vertical_lines_times]],
+            data['datetime'].values.astype('datetime64[ns]').astype(np.int64),
+            data['Power_PowerAct'].values.astype(np.float64),
+            self._e['Power_PowerNominal'])
+
+    def _run2_merge(self, ii, startversuch, res):
+        # collect run2 results.
+        starts = self.results['starts']
+        starts.set(ii, 'title', f"{self._e} ----- Start {ii} {startversuch['mode']} | {'SUCCESS' if startversuch['success'] else 'FAILED'} | {startversuch['starttime'].round('S')}")
+        for k, v in res.items():
+            starts.set(ii, k, v)
+        starts.set(ii, 'run2', True)
+
+    def dorun2(self, index_list, startversuch, cycles_data=None):
                 ii = startversuch['no']
                 index_list.append(ii)
 
                 if not startversuch['run2']:
+                    item = self._run2_input(startversuch, cycles_data)
+                    if item is not None:
+                        self._run2_merge(ii, startversuch, _run2_compute(item))
 
-                    data = dmyplant2.get_cycle_data2(self, startversuch, max_length=None, min_length=None, silent=True)
+    def run2(self, rda, silent=False, workers=1, processes=False):
+        """refine the run1 results of the selected starts with the engine data 
 
-                    if not data.empty:
-
-                        pl, _ = dmyplant2.detect_edge_left(data, 'Power_PowerAct', startversuch)
-                        #pr, _ = detect_edge_right(data, 'Power_PowerAct', startversuch)
-                        #sl, _ = detect_edge_left(data, 'Various_Values_SpeedAct', startversuch)
-                        #sr, _ = detect_edge_right(data, 'Various_Values_SpeedAct', startversuch)
+        Args:
+            rda (pd.DataFrame): selected starts
+            silent (bool, optional): no progress bars. Defaults to False.
+            workers (int, optional): number of concurrent downloads & compute workers. Defaults to 1.
+            processes (bool, optional): compute in a process pool instead of threads. Defaults to False.
 
-                        self.results['starts'][ii]['title'] = f"{self._e} ----- Start {ii} {startversuch['mode']} | {'SUCCESS' if startversuch['success'] else 'FAILED'} | {startversuch['starttime'].round('S')}"
-                        #sv_lines = {k:(startversuch[k] if k in startversuch else np.NaN) for k in filterFSM.vertical_lines_times]}
-                        sv_lines = [v for v in startversuch[filterFSM.vertical_lines_times]]
-                        start = startversuch['starttime'];
-                        
-                        # lade die in run1 gesammelten Daten in ein DataFrame, ersetze NaN Werte mit 0
-                        backup = {}
-                        svdf = pd.DataFrame(sv_lines, index=filterFSM.vertical_lines_times, columns=['FSM'], dtype=np.float64).fillna(0)
-                        svdf['RUN2'] = svdf['FSM']
-
-                        # intentionally excluded - Dieter 1.3.2022
-                        #if svdf.at['speedup','FSM'] > 0.0:
-                        #        svdf.at['speedup','RUN2'] = sl.loc.timestamp() - start.timestamp() - np.cumsum(svdf['RUN2'])['starter']
-                        #        svdf.at['idle','RUN2'] = svdf.at['idle','FSM'] - (svdf.at['speedup','RUN2'] - svdf.at['speedup','FSM'])
-                        if svdf.at['loadramp','FSM'] > 0.0:
-                                calc_loadramp = pl.loc.timestamp() - start.timestamp() - np.cumsum(svdf['RUN2'])['synchronize']
-                                svdf.at['loadramp','RUN2'] = calc_loadramp
-
-                                # collect run2 results.
-                                backup['loadramp'] = svdf.at['loadramp','FSM'] # alten Wert merken
-                                self.results['starts'][ii]['loadramp'] = calc_loadramp
-
-                        with warnings.catch_warnings():
-                            warnings.simplefilter("ignore")
-                            calc_maxload = pl.val
-                            try:
-                                calc_ramp = (calc_maxload / self._e['Power_PowerNominal']) * 100 / svdf.at['loadramp','RUN2']
-                            except ZeroDivisionError as err:
-                                logging.warning(f"calc_ramp: {str(err)}")
-                                calc_ramp = np.NaN
-                            # doppelte Hosenträger ... hier könnte man ein wenig aufräumen :-)
-                            if not np.isfinite(calc_ramp) :
-                                calc_ramp = np.NaN
-
-                            backup_cumstarttime = np.cumsum(svdf['FSM'])['loadramp']
-                            calc_cumstarttime = np.cumsum(svdf['RUN2'])['loadramp']
-                        svdf = pd.concat([
-                                svdf, 
-                                pd.DataFrame.from_dict(
-                                        {       'maxload':['-',calc_maxload],
-                                                'ramprate':['-',calc_ramp],
-                                                'cumstarttime':[backup_cumstarttime, calc_cumstarttime]
-                                        }, 
-                                        columns=['FSM','RUN2'],
-                                        orient='index')]
-                                )
-                        #display(HTML(svdf.round(2).T.to_html(escape=False)))
-
-                        # collect run2 results.
-                        self.results['starts'][ii]['maxload'] = calc_maxload
-                        self.results['starts'][ii]['ramprate'] = calc_ramp
-                        backup['cumstarttime'] = backup_cumstarttime
-                        self.results['starts'][ii]['cumstarttime'] = calc_cumstarttime
-
-                        self.results['starts'][ii]['backup'] = backup
-                        self.results['starts'][ii]['run2'] = True
-
-    def run2(self, rda, silent=False):
-        index_list = []
-        if silent:
-            for n, startversuch in rda.iterrows():
-                self.dorun2(index_list, startversuch)
+        Returns:
+            pd.DataFrame: the selected starts, including the run2 results.
+        """
+        index_list = list(rda['no'])
+        # download the data of all starts up front, in a few large requests
+        todo = rda[~rda['run2'].astype(bool)]
+        cycles_data = dmyplant2.load_cycles_data(self, todo, silent=silent, workers=workers) if not todo.empty else {}
+
+        jobs = []
+        for n, startversuch in todo.iterrows():
+            item = self._run2_input(startversuch, cycles_data)
+            if item is not None:
+                jobs.append((startversuch, item))
+
+        pbar = tqdm(total=len(jobs), ncols=80, mininterval=1, unit=' starts', desc="FSM Run2", disable=silent)
+        if workers > 1 and len(jobs) > 1:
+            Executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+            with Executor(max_workers=workers) as executor:
+                chunksize = max(1, len(jobs) // (workers * 4)) if processes else 1
+                results = executor.map(_run2_compute, [item for _, item in jobs], chunksize=chunksize)
+                # merged in the order of the selected starts
+                for (startversuch, _), res in zip(jobs, results):
+                    self._run2_merge(startversuch['no'], startversuch, res)
+                    pbar.update(1)
         else:
-            for n, startversuch in tqdm(rda.iterrows(), total=rda.shape[0], ncols=80, mininterval=1, unit=' starts', desc="FSM Run2"):
-                self.dorun2(index_list, startversuch)
-        return pd.DataFrame([self.results['starts'][s] for s in index_list])
+            for startversuch, item in jobs:
+                self._run2_merge(startversuch['no'], startversuch, _run2_compute(item))
+                pbar.update(1)
+        pbar.close()
+        return self.starts.iloc[index_list].reset_index(drop=True)
+
+def _run2_compute(item):
+    # run2 calculations of a single start, executed in a worker thread or process.
+    starttime, sv_lines, times, power, power_nominal = item
+    pl = dmyplant2.edge_left(times, power, left=starttime)
+    #pr, _ = detect_edge_right(data, 'Power_PowerAct', startversuch)
+    #sl, _ = detect_edge_left(data, 'Various_Values_SpeedAct', startversuch)
+    #sr, _ = detect_edge_right(data, 'Various_Values_SpeedAct', startversuch)
+
+    # lade die in run1 gesammelten Daten in ein DataFrame, ersetze NaN Werte mit 0
+    res = {}
+    backup = {}
+    svdf = pd.DataFrame(sv_lines, index=filterFSM.vertical_lines_times, columns=['FSM'], dtype=np.float64).fillna(0)
+    svdf['RUN2'] = svdf['FSM']
+
+    # intentionally excluded - Dieter 1.3.2022
+    #if svdf.at['speedup','FSM'] > 0.0:
+    #        svdf.at['speedup','RUN2'] = sl.loc.timestamp() - start.timestamp() - np.cumsum(svdf['RUN2'])['starter']
+    #        svdf.at['idle','RUN2'] = svdf.at['idle','FSM'] - (svdf.at['speedup','RUN2'] - svdf.at['speedup','FSM'])
+    if svdf.at['loadramp','FSM'] > 0.0 and pd.notna(pl.loc): # no power data => keep the FSM value
+            calc_loadramp = pl.loc.timestamp() - starttime.timestamp() - np.cumsum(svdf['RUN2'])['synchronize']
+            svdf.at['loadramp','RUN2'] = calc_loadramp
+
+            # collect run2 results.
+            backup['loadramp'] = svdf.at['loadramp','FSM'] # alten Wert merken
+            res['loadramp'] = calc_loadramp
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        calc_maxload = pl.val
+        try:
+            calc_ramp = (calc_maxload / power_nominal) * 100 / svdf.at['loadramp','RUN2']
+        except ZeroDivisionError as err:
+            logging.warning(f"calc_ramp: {str(err)}")
+            calc_ramp = np.NaN
+        # doppelte Hosenträger ... hier könnte man ein wenig aufräumen :-)
+        if not np.isfinite(calc_ramp) :
+            calc_ramp = np.NaN
+
+        backup_cumstarttime = np.cumsum(svdf['FSM'])['loadramp']
+        calc_cumstarttime = np.cumsum(svdf['RUN2'])['loadramp']
+
+    # collect run2 results.
+    res['maxload'] = calc_maxload
+    res['ramprate'] = calc_ramp
+    backup['cumstarttime'] = backup_cumstarttime
+    res['cumstarttime'] = calc_cumstarttime
+    res['backup'] = backup
+    return res
 
 ############################################################################
 
@@ -0,0 +1,103 @@
+"""FSM run1 benchmark on a synthetic message log
+
+usage:  python -m dmyplant2.dFSM.dFSMBenchmark [number of messages]
+
+compares the iterrows driven loop of earlier versions (one pandas Series per message,
+string triggers, deepcopy of every status vector) with run1 (Message records, compiled
+transition table) and prints messages/second. Both use the same result handlers,
+the difference is the message loop.
+"""
+import copy
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from .dFSM import msgFSM
+
+_cycle = [
+    ('1231', 'Request module on'), ('1249', 'Starter on'), ('3225', 'Ignition on'),
+    ('2124', 'Idle'), ('2139', 'Request Synchronization'), ('1235', 'Generator CB closed'),
+    ('9047', 'Target load reached'), ('1232', 'Request module off'), ('1236', 'Generator CB opened'),
+    ('1234', 'Operation off'), ('3226', 'Ignition off')
+]
+
+def synthetic_messages(n, seed=0):
+    """message log with n messages, operating cycles (some aborted) mixed with alarms, warnings & service selector messages"""
+    rng = np.random.default_rng(seed)
+    ts = 1_600_000_000_000
+    rows = []
+    while len(rows) < n:
+        r = rng.random()
+        if r < 0.05:
+            name, text = [('1225','Service selector switch Off'),('1226','Service selector switch Manual'),('1227','Service selector switch Automatic')][rng.integers(3)]
+            rows.append((ts, name, 600, text))
+        elif r < 0.4:
+            name = str(rng.integers(1000, 9999))
+            rows.append((ts, name, [650, 700, 800][rng.integers(3)], f"Message {name}"))
+        else:
+            k = rng.integers(1, len(_cycle) + 1)
+            for name, text in _cycle[:k]:
+                ts += int(rng.integers(0, 400_000))
+                rows.append((ts, name, 600, text))
+            if k < len(_cycle):
+                rows.append((ts, '3226', 600, 'Ignition off'))
+        ts += int(rng.integers(0, 300_000))
+    df = pd.DataFrame(rows[:n], columns=['timestamp','name','severity','message'])
+    df['associatedValues'] = [{}] * df.shape[0]
+    return df.reset_index()
+
+class _Engine:
+    """minimal Engine replacement, delivers the synthetic messages"""
+    def __init__(self, messages, basedir):
+        self._messages = messages
+        self._fname = os.path.join(basedir, 'benchmark')
+
+    def __getitem__(self, key):
+        return None
+
+    def __str__(self):
+        return 'benchmark'
+
+    def get_messages(self, p_from=None, p_to=None):
+        return self._messages
+
+def _iterrows_run1(fsm):
+    # the message loop of earlier versions, msgFSM.run1 & dorun1 before the Message records
+    runlogdetail = []
+    for i, msg in fsm._messages.iterrows():
+        fsm.svec.msg = msg
+        retsv = fsm.call_trigger_states()
+        for sv in retsv:
+            fsm.svec = sv
+            runlogdetail.append(copy.deepcopy(sv))
+            fsm._fsm_Service_selector()
+            fsm._fsm_collect_alarms()
+            fsm._fsm_Operating_Cycle()
+    return runlogdetail
+
+def benchmark_run1(n=500000, seed=0):
+    """time run1 against the iterrows driven loop
+
+    Returns:
+        dict: messages/second before (iterrows) and after (run1)
+    """
+    messages = synthetic_messages(n, seed)
+    with tempfile.TemporaryDirectory() as basedir:
+        fsm = msgFSM(_Engine(messages, basedir))
+        t0 = time.perf_counter()
+        _iterrows_run1(fsm)
+        before = n / (time.perf_counter() - t0)
+
+        fsm = msgFSM(_Engine(messages, basedir))
+        t0 = time.perf_counter()
+        fsm.run1(silent=True)
+        after = n / (time.perf_counter() - t0)
+    return {'messages': n, 'before': before, 'after': after}
+
+if __name__ == '__main__':
+    res = benchmark_run1(int(sys.argv[1]) if len(sys.argv) > 1 else 500000)
+    print(f"{res['messages']} messages | iterrows: {res['before']:10.0f} msg/s | run1: {res['after']:10.0f} msg/s | {res['after']/res['before']:.1f}x")
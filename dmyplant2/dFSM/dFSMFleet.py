@@ -0,0 +1,106 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+from tqdm.auto import tqdm
+
+from dmyplant2.dEngine import Engine
+from dmyplant2.dValidation import Validation
+from .dFSM import msgFSM
+
+def _run1_engine(e, p_from, p_to, skip_days, successtime, enforce):
+    # runs in a worker process, the results are persisted in the engine's _statemachine.pkl
+    fsm = msgFSM(e, p_from=p_from, p_to=p_to, skip_days=skip_days, successtime=successtime)
+    if not enforce and os.path.exists(fsm.pfn):
+        fsm.restore() # continue with the new messages only
+    fsm.run1(enforce=enforce, silent=True)
+    fsm.store()
+    return fsm.starts, fsm.stops, fsm.alarms
+
+class fleetFSM:
+    def __init__(self, engines, mp=None, p_from=None, p_to=None, skip_days=None, successtime=600):
+        """FSM run1 for a fleet of engines
+
+        Args:
+            engines (Validation or list): a Validation, a list of Engine instances or serial numbers
+            mp (dmyplant2.MyPlant, optional): MyPlant instance, required for serial numbers. Defaults to None.
+            p_from, p_to, skip_days, successtime: passed to msgFSM for every engine.
+        """
+        if isinstance(engines, Validation):
+            engines = engines.engines
+        self._engines = []
+        self._failed = {}
+        sns = [str(e) for e in engines if not isinstance(e, Engine) and Engine.asset_data_expired(mp, e)]
+        if sns:
+            mp.preload_assets(sns) # one bulk request instead of one per engine
+        for e in engines:
+            if isinstance(e, Engine):
+                self._engines.append(e)
+            else:
+                try:
+                    self._engines.append(Engine.from_sn(mp, str(e)))
+                except Exception as err:
+                    self._failed[str(e)] = err
+                    logging.error(f"{e}: Engine Instance cannot be created, {str(err)}")
+        if sns:
+            mp._assets = None
+        self._p_from = p_from
+        self._p_to = p_to
+        self._skip_days = skip_days
+        self._successtime = successtime
+        self._starts = pd.DataFrame([])
+        self._stops = pd.DataFrame([])
+        self._alarms = pd.DataFrame([])
+
+    def run1(self, workers=None, enforce=False, silent=False):
+        """load the messages & run1 for all engines in a process pool
+
+        stored results are continued with the new messages, see msgFSM.run1
+
+        Args:
+            workers (int, optional): number of processes. Defaults to all cores.
+            enforce (bool, optional): replay all messages. Defaults to False.
+            silent (bool, optional): no progress bar. Defaults to False.
+        """
+        results = {}
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            futures = {executor.submit(_run1_engine, e, self._p_from, self._p_to, self._skip_days, self._successtime, enforce): e._sn for e in self._engines}
+            pbar = tqdm(total=len(futures), ncols=80, unit=' engines', desc="FSM Fleet", disable=silent)
+            for fut in as_completed(futures):
+                sn = futures[fut]
+                try:
+                    results[sn] = fut.result()
+                except Exception as err:
+                    self._failed[sn] = err
+                    logging.error(f"{sn}: FSM run1 failed, {str(err)}")
+                pbar.update(1)
+            pbar.close()
+
+        # collect in the order of the engines list
+        sns = [e._sn for e in self._engines if e._sn in results]
+        if sns:
+            self._starts = pd.concat({sn:results[sn][0] for sn in sns}, names=['serialNumber', None]).reset_index(level=0)
+            self._stops = pd.concat({sn:results[sn][1] for sn in sns}, names=['serialNumber', None]).reset_index(level=0)
+            self._alarms = pd.concat({sn:results[sn][2] for sn in sns}, names=['serialNumber', None]).reset_index(level=0)
+        return self
+
+    @property
+    def starts(self):
+        """fleet wide starts table, column serialNumber identifies the engine"""
+        return self._starts
+
+    @property
+    def stops(self):
+        """fleet wide stops table, column serialNumber identifies the engine"""
+        return self._stops
+
+    @property
+    def alarms(self):
+        """fleet wide alarms & warnings table, column serialNumber identifies the engine"""
+        return self._alarms
+
+    @property
+    def failed(self):
+        """{serialNumber: exception} of the engines without results"""
+        return self._failed
@@ -25,8 +25,8 @@ def FSMPlot_Start(fsm,startversuch, data, vset, dset, figsize=(16,10)):
 
 
     #fsm.disp_result(startversuch)
-    al_lines = disp_alarms(startversuch)
-    w_lines = disp_warnings(startversuch)
+    al_lines = disp_alarms(startversuch, fsm)
+    w_lines = disp_warnings(startversuch, fsm)
     
     fig = dbokeh_chart(data, dset, title=ftitle, grid=False, figsize=figsize, style='line', line_width=0)
 
@@ -124,28 +124,42 @@ def _debug(start, ende, data, dataname):
         print(f"=> empty dataset!!!")
     print(f"-----------------------------------------")
 
-def _load_reduced_data(fsm, startversuch, ptts_from, ptts_to, pdata=None):
+def _reduced_windows(startversuch, ptts_from, ptts_to):
     # Hires 1" von 'starttime' bis 15' danach und von 15' vor 'endtime' bis Ende
     # dazwischen alle 30" einen Messwert. 
-    data1 = pd.DataFrame([]);data2 = pd.DataFrame([]);data3 = pd.DataFrame([]);
     d1t = int(arrow.get(startversuch['starttime'] + pd.Timedelta(value=15, unit='min')).timestamp() * 1000)
     d3t = int(arrow.get(startversuch['endtime'] - pd.Timedelta(value=15, unit='min')).timestamp() * 1000)
     d3t = max(d3t, ptts_from); d1t = min(d1t,d3t)
-    data1 = load_data(fsm,cycletime=1, tts_from=ptts_from, tts_to=d1t, silent=True, p_data=pdata)
-    if 'time' in data1:
-        data1 = data1[(data1['time'] >= ptts_from) & (data1['time'] < d1t)]
-    data2 = load_data(fsm, cycletime=30, tts_from=d1t, tts_to=d3t, silent=True, p_data=pdata)
-    if 'time' in data2:
-        data2 = data2[(data2['time'] >= d1t) & (data2['time'] < d3t)]
-    data3 = load_data(fsm,cycletime=1, tts_from=d3t, tts_to=ptts_to, silent=True, p_data=pdata)
-    if 'time' in data3:
-        data3 = data3[(data3['time'] >= d3t) & (data3['time'] <= ptts_to)]
+    # (cycletime, from, to), the last window includes 'to'
+    return [(1, ptts_from, d1t), (30, d1t, d3t), (1, d3t, ptts_to)]
+
+def _slice_data(data, ts_from, ts_to):
+    # rows of the time sorted data between ts_from & ts_to
+    if data is None or data.empty:
+        return pd.DataFrame([])
+    t = data['time'].values
+    return data.iloc[np.searchsorted(t, ts_from, side='left'):np.searchsorted(t, ts_to, side='right')]
+
+def _load_reduced_data(fsm, startversuch, ptts_from, ptts_to, pdata=None, cycles_data=None):
+    ldata = []
+    windows = _reduced_windows(startversuch, ptts_from, ptts_to)
+    for i, (cycletime, lfrom, lto) in enumerate(windows):
+        if cycles_data is None:
+            data = load_data(fsm, cycletime=cycletime, tts_from=lfrom, tts_to=lto, silent=True, p_data=pdata)
+        else:
+            data = _slice_data(cycles_data.get(cycletime), lfrom, lto)
+        if 'time' in data:
+            if i < len(windows) - 1:
+                data = data[(data['time'] >= lfrom) & (data['time'] < lto)]
+            else:
+                data = data[(data['time'] >= lfrom) & (data['time'] <= lto)]
+        ldata.append(data)
     #_debug(ptts_from,d1t, data1, 'data1')
     #_debug(d1t,d3t, data2, 'data2')
     #_debug(d3t,ptts_to,data3, 'data3')
-    return pd.concat([data1,data2,data3]).reset_index(drop='index')
+    return pd.concat(ldata).reset_index(drop='index')
 
-def get_cycle_data2(fsm,startversuch, max_length=None, min_length=None, cycletime=None, silent=False, p_data=None):
+def _cycle_period(fsm, startversuch, max_length=None, min_length=None):
     t0 = int(arrow.get(startversuch['starttime']).timestamp() * 1000 - fsm._pre_period * 1000)
     t1 = int(arrow.get(startversuch['endtime']).timestamp() * 1000 + fsm._post_period * 1000)
     if max_length:
@@ -154,7 +168,36 @@ def get_cycle_data2(fsm,startversuch, max_length=None, min_length=None, cycletim
     if min_length:
         if (t1 - t0) < min_length * 1e3:
             t1 = int(t0 + min_length * 1e3)
-    data = _load_reduced_data(fsm, startversuch, t0, t1, pdata=p_data)
+    return t0, t1
+
+def load_cycles_data(fsm, startversuche, max_length=None, min_length=None, silent=False, p_data=None, workers=1):
+    """download the data of many starts at once, see get_cycle_data2(..., cycles_data=...)
+
+    the time windows of all starts are planned up front, neighbouring windows are 
+    downloaded together in a few large requests.
+
+    Args:
+        fsm (msgFSM): the FSM instance
+        startversuche (pd.DataFrame): the selected starts
+        workers (int, optional): number of concurrent requests. Defaults to 1.
+
+    Returns:
+        dict: {cycletime: pd.DataFrame}, the data of all starts per cycletime.
+    """
+    windows = {}
+    for _, startversuch in startversuche.iterrows():
+        t0, t1 = _cycle_period(fsm, startversuch, max_length, min_length)
+        for cycletime, lfrom, lto in _reduced_windows(startversuch, t0, t1):
+            if lto >= lfrom:
+                windows.setdefault(cycletime, []).append((lfrom, lto))
+    engine = fsm._e
+    itemIds = engine.get_dataItems(p_data or ['Various_Values_SpeedAct','Power_PowerAct'])
+    return {cycletime: engine.hist_data2_windows(itemIds, lwindows, timeCycle=cycletime, silent=silent, workers=workers) 
+        for cycletime, lwindows in windows.items()}
+
+def get_cycle_data2(fsm,startversuch, max_length=None, min_length=None, cycletime=None, silent=False, p_data=None, cycles_data=None):
+    t0, t1 = _cycle_period(fsm, startversuch, max_length, min_length)
+    data = _load_reduced_data(fsm, startversuch, t0, t1, pdata=p_data, cycles_data=cycles_data)
     if not data.empty:
         data = data[(data['time'] >= t0) & (data['time'] <= t1)]
     return data
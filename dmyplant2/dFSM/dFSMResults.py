@@ -6,54 +6,142 @@ from .dFSM import filterFSM
 
 
 # RUN2 Results
+Edge = namedtuple('edge',["loc", "val"])
+NoEdge = Edge(pd.NaT, np.nan) # empty or all NaN window
+
+def _no_edge(t, v):
+    # nothing to search in, the kernels return position None and NaN curves
+    return len(t) == 0 or bool(np.isnan(v).all())
+
+def _edge(t, v, pos):
+    return NoEdge if pos is None else Edge(pd.Timestamp(t[pos]), v[pos])
+
+def _ns(ts):
+    # timestamp as int64 ns, ints are taken as ns
+    return np.int64(ts) if isinstance(ts, (int, np.integer)) else np.int64(pd.Timestamp(ts).value)
+
+def _edge_right(t, v):
+    # t: int64 ns, v: float64 -> position of the edge, helpline_right, value + helpline
+    if _no_edge(t, v):
+        return None, np.full(len(t), np.nan), np.full(len(t), np.nan)
+    x0 = t[0]; x1 = t[-1]
+    d = x1 - t[np.nanargmax(v)]
+    xfac = min((x1 - x0) / d if d != 0 else 0.0, 150.0)
+    lmax = np.nanmax(v) * xfac * 0.90
+    # Timedelta * float truncates to whole ns, the division by the Timedelta (x1-x0) is a float division
+    with np.errstate(divide='ignore', invalid='ignore'):
+        helpline = np.trunc((t - x0) * lmax) / (x1 - x0)
+        curve = v + helpline
+        try:
+            pos = int(np.nanargmax(curve))
+        except ValueError:
+            pos = len(t) - 1
+    return pos, helpline, curve
+
+def _edge_left(t, v):
+    # t: int64 ns, v: float64 -> position of the edge, helpline_left, value + helpline
+    if _no_edge(t, v):
+        return None, np.full(len(t), np.nan), np.full(len(t), np.nan)
+    x0 = t[0]; x1 = t[-1]
+    d = t[np.nanargmax(v)] - x0
+    xfac = min((x1 - x0) / d if d != 0 else 0.0, 20.0)
+    lmax = np.nanmax(v) * xfac * 0.90
+    with np.errstate(divide='ignore', invalid='ignore'):
+        q = np.trunc((x0 - t) * lmax) / (x1 - x0)
+        curve = v + q + lmax
+        try:
+            pos = int(np.nanargmax(curve))
+        except ValueError:
+            pos = len(t) - 1
+    return pos, q + lmax, curve
+
+def edge_right(t, v, right=None):
+    """right edge of a single window
+
+    Args:
+        t (np.ndarray): int64 timestamps in ns, ascending
+        v (np.ndarray): float64 values
+        right (optional): only samples before right (Timestamp or int ns) are considered. Defaults to None.
+
+    Returns:
+        edge: namedtuple(loc, val), NoEdge (NaT, NaN) for an empty or all NaN window
+    """
+    stop = np.searchsorted(t, _ns(right), side='left') if right is not None else len(t)
+    t = t[:stop]; v = v[:stop]
+    pos, _, _ = _edge_right(t, v)
+    return _edge(t, v, pos)
+
+def edge_left(t, v, left=None):
+    """left edge of a single window
+
+    Args:
+        t (np.ndarray): int64 timestamps in ns, ascending
+        v (np.ndarray): float64 values
+        left (optional): only samples after left (Timestamp or int ns) are considered. Defaults to None.
+
+    Returns:
+        edge: namedtuple(loc, val), NoEdge (NaT, NaN) for an empty or all NaN window
+    """
+    start = np.searchsorted(t, _ns(left), side='right') if left is not None else 0
+    t = t[start:]; v = v[start:]
+    pos, _, _ = _edge_left(t, v)
+    return _edge(t, v, pos)
+
+def _edges(kernel, t, v, offsets, bounds, side):
+    res = []
+    for i in range(len(offsets) - 1):
+        start, stop = int(offsets[i]), int(offsets[i+1])
+        if bounds is not None and bounds[i] is not None:
+            cut = start + int(np.searchsorted(t[start:stop], _ns(bounds[i]), side=side))
+            start, stop = (cut, stop) if side == 'right' else (start, cut)
+        wt = t[start:stop]; wv = v[start:stop]
+        pos, _, _ = kernel(wt, wv)
+        res.append(_edge(wt, wv, pos))
+    return res
+
+def edges_right(t, v, offsets, rights=None):
+    """right edges of many windows, stored back to back in one array
+
+    Args:
+        t (np.ndarray): int64 timestamps in ns, ascending within each window
+        v (np.ndarray): float64 values
+        offsets (array like): window i is t[offsets[i]:offsets[i+1]]
+        rights (list, optional): right bound per window, see edge_right. Defaults to None.
+
+    Returns:
+        list: edge namedtuples, one per window, NoEdge for empty or all NaN windows
+    """
+    return _edges(_edge_right, np.asarray(t, dtype=np.int64), np.asarray(v, dtype=np.float64), offsets, rights, 'left')
+
+def edges_left(t, v, offsets, lefts=None):
+    """left edges of many windows, stored back to back in one array
+
+    Args:
+        t (np.ndarray): int64 timestamps in ns, ascending within each window
+        v (np.ndarray): float64 values
+        offsets (array like): window i is t[offsets[i]:offsets[i+1]]
+        lefts (list, optional): left bound per window, see edge_left. Defaults to None.
+
+    Returns:
+        list: edge namedtuples, one per window, NoEdge for empty or all NaN windows
+    """
+    return _edges(_edge_left, np.asarray(t, dtype=np.int64), np.asarray(v, dtype=np.float64), offsets, lefts, 'right')
+
 def detect_edge_right(data, name, startversuch=pd.DataFrame([]), right=None):
     right = startversuch['endtime'] if not startversuch.empty else right
     ndata = data[data['datetime'] < right].copy() if right != None else data.copy()
-    fac = {'left': -1.0, 'right': 1.0}
-    ldata = ndata[['datetime',name]]
-    x0 = ldata.iloc[0]['datetime'];
-    x1 = ldata.iloc[-1]['datetime'];
-    edge0 = ndata.loc[ndata[name].idxmax()]
-    try:
-        xfac = (x1 - x0) / (x1 - edge0.datetime)
-    except ZeroDivisionError:
-        xfac = 0.0
-    xfac = min(xfac, 150.0)
-    #print(f"###### | xfac: {xfac:5.2f} | kind: {kind:>5} | name: {name}")
-    lmax = ldata.loc[:,name].max() * xfac * 0.90
-    ndata['helpline_right'] = (ndata['datetime'] - x0)*lmax/(x1-x0)
-    ndata[name+'_right'] = ndata[name]+(ndata['datetime'] - x0)*lmax/(x1-x0)
-    Point = namedtuple('edge',["loc", "val"])
-    try:
-        edge = ndata.loc[ndata[name+'_right'].idxmax()]
-    except Exception as err:
-        #logging.error(str(err))
-        edge = ndata.iloc[-1]
-    return  Point(edge.datetime, ldata.at[edge.name,name]), ndata
+    t = ndata['datetime'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    v = ndata[name].to_numpy(dtype=np.float64)
+    pos, ndata['helpline_right'], ndata[name+'_right'] = _edge_right(t, v)
+    return (NoEdge if pos is None else Edge(ndata['datetime'].iloc[pos], v[pos])), ndata
 
 def detect_edge_left(data, name, startversuch=pd.DataFrame([]), left=None):
     left = startversuch['starttime'] if not startversuch.empty else left
     ndata = data[data['datetime'] > left].copy() if left != None else data.copy()
-    ldata = ndata[['datetime',name]]
-    x0 = ldata.iloc[0]['datetime'];
-    x1 = ldata.iloc[-1]['datetime'];
-    edge0 = ndata.loc[ndata[name].idxmax()]
-    try:
-        xfac = (x1 - x0) / (edge0.datetime - x0)
-    except ZeroDivisionError:
-        xfac = 0.0
-    xfac = min(xfac, 20.0)
-    #print(f"###### | xfac: {xfac:5.2f} | left | name: {name}")
-    lmax = ldata.loc[:,name].max() * xfac * 0.90
-    ndata['helpline_left'] = (x0 - ndata['datetime'])*lmax/(x1-x0) + lmax
-    ndata[name+'_left'] = ndata[name]+(x0 - ndata['datetime'])*lmax/(x1-x0) + lmax
-    Point = namedtuple('edge',["loc", "val"])
-    try:
-        edge = ndata.loc[ndata[name+'_left'].idxmax()]
-    except Exception as err:
-        #logging.error(str(err))
-        edge = ndata.iloc[-1]
-    return  Point(edge.datetime, ldata.at[edge.name,name]), ndata
+    t = ndata['datetime'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    v = ndata[name].to_numpy(dtype=np.float64)
+    pos, ndata['helpline_left'], ndata[name+'_left'] = _edge_left(t, v)
+    return (NoEdge if pos is None else Edge(ndata['datetime'].iloc[pos], v[pos])), ndata
 
 ## Resultate aus einem FSM Lauf ermitteln.
 def disp_result(startversuch):
@@ -63,59 +151,93 @@ def disp_result(startversuch):
     display(HTML(summary.to_html(escape=False, index=False)))
     #display(HTML('<h3>'+ summary.to_html(escape=False, index=False) + '</h3>'))
 
-def disp_alarms(startversuch):
+def _start_alarms(startversuch, severity, fsm=None):
+    # alarms or warnings of a start, from the FSM alarms table or the lists of results stored by earlier versions
+    if fsm is None:
+        key = 'alarms' if severity == 800 else 'warnings'
+        if key not in startversuch:
+            raise ValueError(f"start {startversuch.get('no', '')}: no {key} list, pass the msgFSM instance, e.g. disp_{key}(startversuch, fsm)")
+        return [{
+                'state':al['state'],'severity':al['msg']['severity'],'Number':al['msg']['name'],
+                'timestamp':pd.to_datetime(int(al['msg']['timestamp'])*1e6),'message':al['msg']['message']
+            } for al in startversuch['alarms' if severity == 800 else 'warnings']]
+    al = fsm.alarms
+    al = al[(al['cycle'] == 'starts') & (al['no'] == startversuch['no']) & (al['severity'] == severity)]
+    return [{'state':st,'severity':severity,'Number':nr,'timestamp':ts,'message':m}
+            for st, nr, ts, m in zip(al['state'], al['name'], al['timestamp'], al['message'])]
+
+def _disp_start_alarms(startversuch, severity, fsm=None):
     ald = []; alt = []
-    for al in startversuch['alarms']:
+    for al in _start_alarms(startversuch, severity, fsm):
             ald.append({
-                    'state':al['state'],'severity':al['msg']['severity'],'Number':al['msg']['name'],
-                    'date':pd.to_datetime(int(al['msg']['timestamp'])*1e6).strftime('%d.%m.%Y %H:%M:%S'),
-                    'message':al['msg']['message']
+                    'state':al['state'],'severity':al['severity'],'Number':al['Number'],
+                    'date':al['timestamp'].strftime('%d.%m.%Y %H:%M:%S'),
+                    'message':al['message']
             })
-            alt.append(pd.to_datetime(int(al['msg']['timestamp'])*1e6))
+            alt.append(al['timestamp'])
     aldf = pd.DataFrame(ald)
     if not aldf.empty:
         display(HTML(aldf.to_html(escape=False, index=False)))
-        #display(HTML('<h3>'+ aldf.to_html(escape=False, index=False) + '</h3>'))
     return alt
 
-def disp_warnings(startversuch):
-    wad = []; wat = []
-    for wd in startversuch['warnings']:
-            wad.append({
-                    'state':wd['state'],'severity':wd['msg']['severity'],'Number':wd['msg']['name'],
-                    'date':pd.to_datetime(int(wd['msg']['timestamp'])*1e6).strftime('%d.%m.%Y %H:%M:%S'),
-                    'message':wd['msg']['message']
-            })
-            wat.append(pd.to_datetime(int(wd['msg']['timestamp'])*1e6))
-    wdf = pd.DataFrame(wad)
-    if not wdf.empty:
-        display(HTML(wdf.to_html(escape=False, index=False)))
-        #display(HTML('<h3>'+ wdf.to_html(escape=False, index=False) + '</h3>'))
-    return wat 
-
-
-def _pareto(mm):
-    unique_res = set([msg['name'] for msg in mm])
-    res = [{ 'anz': len([msg for msg in mm if msg['name'] == m]),
-                'severity': mm[0]['severity'],
-                'number':m,
-                'msg':f"{str([msg['message'] for msg in mm if msg['name'] == m][0]):>}"
-            } for m in unique_res]
-    return sorted(res, key=lambda x:x['anz'], reverse=True)        
-
-def _states_pareto(fsm, severity, states = []):
-    rmessages = []
-    if type(states) == str:
-        states = [states]
-    for state in states:
-        rmessages += [msg for msg in fsm.states[state]._messages if msg['severity'] == severity]
-    return _pareto(rmessages)
-
-def alarms_pareto(fsm, states):
-    return pd.DataFrame(_states_pareto(fsm, 800, states))
-
-def warnings_pareto(fsm, states):
-    return pd.DataFrame(_states_pareto(fsm, 700, states))
+def disp_alarms(startversuch, fsm=None):
+    """display the alarms of a start, fsm (msgFSM) provides the alarms table,
+    required unless startversuch holds the alarm list of earlier versions
+
+    Returns:
+        list: alarm timestamps
+    """
+    return _disp_start_alarms(startversuch, 800, fsm)
+
+def disp_warnings(startversuch, fsm=None):
+    """display the warnings of a start, fsm (msgFSM) provides the alarms table,
+    required unless startversuch holds the warning list of earlier versions
+
+    Returns:
+        list: warning timestamps
+    """
+    return _disp_start_alarms(startversuch, 700, fsm)
+
+
+def pareto(alarms, severity=None, states=None, by=('state', 'severity', 'number')):
+    """message counts of an alarms table in one groupby pass
+
+    Args:
+        alarms (pd.DataFrame): msgFSM.alarms or fleetFSM.alarms (with column serialNumber)
+        severity (int, optional): 800 alarms, 700 warnings, None both. Defaults to None.
+        states (str or list, optional): only messages in these FSM states, None all. Defaults to None.
+        by (tuple, optional): group columns out of state, severity, number. Defaults to ('state', 'severity', 'number').
+
+    Returns:
+        pd.DataFrame: columns by + anz, msg and engines (fleet tables only), sorted by anz
+    """
+    by = list(by)
+    df = alarms.rename(columns={'name':'number'})
+    if severity is not None:
+        df = df[df['severity'] == severity]
+    if states is not None:
+        df = df[df['state'].isin([states] if isinstance(states, str) else states)]
+    agg = {'anz': ('number', 'size'), 'msg': ('message', 'first')}
+    if 'serialNumber' in df:
+        agg['engines'] = ('serialNumber', 'nunique')
+    if df.empty:
+        return pd.DataFrame(columns=by + list(agg))
+    res = df.groupby(by, observed=True, sort=False).agg(**agg).reset_index()
+    for c in by:
+        if isinstance(res[c].dtype, pd.CategoricalDtype):
+            res[c] = res[c].astype(str)
+    return res.sort_values(['anz'] + by, ascending=[False] + [True] * len(by), kind='mergesort').reset_index(drop=True)
+
+def _states_pareto(fsm, severity, states=None):
+    return pareto(fsm.alarms, severity, states, by=('severity', 'number'))[['anz','severity','number','msg'] + (['engines'] if 'serialNumber' in fsm.alarms else [])]
+
+def alarms_pareto(fsm, states=None):
+    """alarms per message number, fsm is a msgFSM or fleetFSM, states None => all"""
+    return _states_pareto(fsm, 800, states)
+
+def warnings_pareto(fsm, states=None):
+    """warnings per message number, fsm is a msgFSM or fleetFSM, states None => all"""
+    return _states_pareto(fsm, 700, states)
 
 def summary(fsm):
     display(HTML(
@@ -0,0 +1,423 @@
+import json
+import os
+import shutil
+import threading
+import time
+import arrow
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow # type: ignore comment;
+    _parquet = True
+except ImportError:
+    _parquet = False
+
+
+class HistStore:
+    """
+    Append only, time partitioned columnar store for Myplant history data
+    of one engine and one timeCycle.
+
+    layout:
+    <basedir>/hist/<timeCycle>/<dataItemId>/item.json
+    <basedir>/hist/<timeCycle>/<dataItemId>/index.json
+    <basedir>/hist/<timeCycle>/<dataItemId>/<YYYYMM>/<first ms>_<last ms>_<write seq>.parquet
+
+    each dataItem is stored in its own column files ('time', 'value'), partitioned
+    by month. Appending data only writes new partition files, existing partitions 
+    are never read or rewritten. Rows stored more than once, e.g. the re-fetched
+    recent data, are read from the newest partition (write seq). Parquet files 
+    are used if pyarrow is installed, pickle files otherwise.
+
+    index.json records the time intervals [from ms, to ms] already downloaded, 
+    including periods without data, so holes between downloads are known exactly.
+    """
+    _ext = '.parquet' if _parquet else '.pkl'
+    _latency = 3600 # sec, data younger than this might not have arrived at Myplant yet.
+    _lock = threading.Lock()
+    _seq = 0
+
+    def __init__(self, basedir, timeCycle):
+        self._timeCycle = int(timeCycle)
+        self._base = os.path.join(basedir, 'hist', str(self._timeCycle))
+
+    def _dir(self, itemId):
+        return os.path.join(self._base, str(int(itemId)))
+
+    def items(self):
+        """dict of all stored dataItems
+
+        Returns:
+            dict: {int: [name, unit], ...}
+        """
+        ret = {}
+        if os.path.exists(self._base):
+            for litem in os.listdir(self._base):
+                fn = os.path.join(self._base, litem, 'item.json')
+                if os.path.exists(fn):
+                    with open(fn, 'r') as f:
+                        ret[int(litem)] = json.load(f)
+        return ret
+
+    def partitions(self, itemId, t_from=None, t_to=None):
+        """list partition files of a dataItem, optionally filtered by time range
+
+        Returns:
+            list: [(first ms, last ms, filename), ...] sorted by first timestamp
+        """
+        ret = []
+        ldir = self._dir(itemId)
+        if not os.path.exists(ldir):
+            return ret
+        for month in os.listdir(ldir):
+            mdir = os.path.join(ldir, month)
+            if not os.path.isdir(mdir):
+                continue
+            for fn in os.listdir(mdir):
+                if not fn.endswith(self._ext):
+                    continue
+                first, last = [int(x) for x in fn[:-len(self._ext)].split('_')[:2]]
+                if (t_from is not None and last < t_from) or (t_to is not None and first > t_to):
+                    continue
+                ret.append((first, last, os.path.join(mdir, fn)))
+        return sorted(ret)
+
+    @classmethod
+    def _next_seq(cls):
+        # increasing write sequence of the partition files
+        with cls._lock:
+            cls._seq = max(cls._seq + 1, time.time_ns())
+            return cls._seq
+
+    def _written(self, fn):
+        # write sequence of a partition file, 0 => stored before the sequence was introduced
+        parts = os.path.basename(fn)[:-len(self._ext)].split('_')
+        return int(parts[2]) if len(parts) > 2 else 0
+
+    def _newest(self, ldfs):
+        # concat partitions [(fn, df), ...], the newest write of a timestamp wins
+        df = pd.concat([ldf for _, ldf in sorted(ldfs, key=lambda x: self._written(x[0]))])
+        return df.sort_values('time', kind='stable').drop_duplicates(subset='time', keep='last')
+
+    def coverage(self, itemId):
+        """first and last stored timestamp in ms of a dataItem or None"""
+        parts = self.partitions(itemId)
+        if not parts:
+            return None
+        return min([p[0] for p in parts]), max([p[1] for p in parts])
+
+    @staticmethod
+    def _merge(intervals, step=1000):
+        # merge overlapping and adjacent (step ms, one sample) intervals
+        ret = []
+        for a, b in sorted(intervals):
+            if ret and a <= ret[-1][1] + step:
+                ret[-1][1] = max(ret[-1][1], b)
+            else:
+                ret.append([a, b])
+        return ret
+
+    def intervals(self, itemId):
+        """time intervals already downloaded for a dataItem
+
+        Returns:
+            list: [[from ms, to ms], ...] sorted, not overlapping
+        """
+        fn = os.path.join(self._dir(itemId), 'index.json')
+        if os.path.exists(fn):
+            with open(fn, 'r') as f:
+                return json.load(f)
+        # data stored before the index was introduced
+        cov = self.coverage(itemId)
+        return [list(cov)] if cov else []
+
+    def _add_interval(self, itemId, t_from, t_to):
+        with self._lock:
+            intervals = self._merge(self.intervals(itemId) + [[int(t_from), int(t_to)]], self._timeCycle * 1000)
+            fn = os.path.join(self._dir(itemId), 'index.json')
+            with open(fn + '.tmp', 'w') as f:
+                json.dump(intervals, f)
+            os.replace(fn + '.tmp', fn)
+
+    def missing(self, itemId, t_from, t_to):
+        """sub intervals of [t_from, t_to] not yet downloaded for a dataItem
+
+        Myplant samples every timeCycle seconds from the start of a request, the gaps
+        are placed on the sample grid of the neighbouring stored interval, so the new
+        rows continue the stored ones. A gap before a stored interval may therefore 
+        start up to one timeCycle before t_from.
+
+        Args:
+            itemId (int): dataItem id
+            t_from (int): first timestamp in ms
+            t_to (int): last timestamp in ms
+
+        Returns:
+            list: [(from ms, to ms), ...]
+
+        Doctest:
+        >>> import tempfile
+        >>> store = HistStore(tempfile.mkdtemp(), 60)
+        >>> t0 = 1609459200000 # 2021-01-01
+        >>> df = pd.DataFrame({'time': t0 + np.arange(10) * 60000, 'x': 1.0})
+        >>> store.append(df, {161: ['x', '']}, t0, t0 + 9 * 60000)
+        >>> [(a - t0, b - t0) for a, b in store.missing(161, t0 - 90000, t0 + 690000)]
+        [(-120000, -60000), (600000, 690000)]
+        """
+        step = self._timeCycle * 1000
+        ret = []
+        cur = t_from
+        prev = None # start of the stored interval before cur, the anchor of its sample grid
+        for a, b in self.intervals(itemId):
+            if b < cur:
+                prev = a
+                continue
+            if a > t_to:
+                break
+            if a > cur:
+                ret.append((a - -(-(a - cur) // step) * step, a - step))
+            prev, cur = a, b + 1
+        if cur <= t_to:
+            start = cur if prev is None else prev + -(-(cur - prev) // step) * step
+            if start <= t_to:
+                ret.append((start, t_to))
+        return ret
+
+    def append(self, df, itemIds, t_from=None, t_to=None):
+        """store new rows, only new partition files are written
+
+        Args:
+            df (pd.DataFrame): history data with a 'time' column in ms and one column per dataItem name
+            itemIds (dict): the dataItems contained in df
+            t_from (int, optional): first timestamp of the download in ms, recorded in the index.
+            t_to (int, optional): last timestamp of the download in ms, recorded in the index.
+        """
+        ldf = df.sort_values('time', kind='stable').drop_duplicates(subset='time', keep='last') if not df.empty else df
+        months = pd.to_datetime(ldf['time'], unit='ms').dt.strftime('%Y%m').values if not ldf.empty else []
+        for itemId, (name, *_) in itemIds.items():
+            ldir = self._dir(itemId)
+            os.makedirs(ldir, exist_ok=True)
+            fn = os.path.join(ldir, 'item.json')
+            if not os.path.exists(fn):
+                with open(fn, 'w') as f:
+                    json.dump(itemIds[itemId], f)
+            if not ldf.empty and name in ldf.columns:
+                idf = pd.DataFrame({'time': ldf['time'].values, 'value': ldf[name].values})
+                for month, mdf in idf.groupby(months):
+                    mdir = os.path.join(ldir, month)
+                    os.makedirs(mdir, exist_ok=True)
+                    pfn = os.path.join(mdir, f"{int(mdf['time'].iloc[0])}_{int(mdf['time'].iloc[-1])}_{self._next_seq()}{self._ext}")
+                    self._write(mdf.reset_index(drop=True), pfn)
+            if t_from is not None and t_to is not None:
+                # recent data might still arrive at Myplant, 
+                # record only what is settled or actually received.
+                settled = int(arrow.now().timestamp() - self._latency) * 1000
+                if t_to > settled:
+                    last = int(ldf['time'].iloc[-1]) if not ldf.empty else t_from - 1000
+                    t_to = min(t_to, max(settled, last))
+                if t_to >= t_from:
+                    self._add_interval(itemId, t_from, t_to)
+
+    def _write(self, df, fn):
+        # write to a temporary file first, a partition is either complete or missing.
+        tfn = fn + '.tmp'
+        if _parquet:
+            df.to_parquet(tfn, index=False)
+        else:
+            df.to_pickle(tfn)
+        os.replace(tfn, fn)
+
+    def _read(self, fn, t_from, t_to):
+        if _parquet:
+            filters = []
+            if t_from is not None:
+                filters.append(('time', '>=', t_from))
+            if t_to is not None:
+                filters.append(('time', '<=', t_to))
+            return pd.read_parquet(fn, filters=filters or None)
+        return pd.read_pickle(fn)
+
+    def read_item(self, itemId, t_from=None, t_to=None):
+        """read a time range of a single dataItem
+
+        Returns:
+            pd.Series: values indexed by 'time' in ms
+        """
+        ldfs = [(fn, self._read(fn, t_from, t_to)) for _, _, fn in self.partitions(itemId, t_from, t_to)]
+        if not ldfs:
+            return pd.Series([], index=pd.Index([], name='time', dtype='int64'), dtype='float64')
+        df = self._newest(ldfs)
+        if t_from is not None:
+            df = df[df['time'] >= t_from]
+        if t_to is not None:
+            df = df[df['time'] <= t_to]
+        return df.set_index('time')['value']
+
+    def read(self, itemIds, t_from=None, t_to=None):
+        """read a time range of several dataItems, merged on 'time'
+
+        Args:
+            itemIds (dict): e.g. {161: ['CountOph','h']}, the names define the column names
+            t_from (int, optional): first timestamp in ms. Defaults to None.
+            t_to (int, optional): last timestamp in ms. Defaults to None.
+
+        Returns:
+            pd.DataFrame: 'time', <dataItem names> ..., 'datetime'
+        """
+        columns = {v[0]: self.read_item(k, t_from, t_to) for k, v in itemIds.items()}
+        return self._combine(columns)
+
+    def read_windows(self, itemIds, windows):
+        """read several time windows of dataItems at once, 
+        every partition file involved is read only once.
+
+        Args:
+            itemIds (dict): e.g. {161: ['CountOph','h']}, the names define the column names
+            windows (list): [(from ms, to ms), ...] 
+
+        Returns:
+            pd.DataFrame: 'time', <dataItem names> ..., 'datetime' of all rows within the windows
+        """
+        windows = self._merge(windows)
+        starts = np.array([w[0] for w in windows], dtype=np.int64)
+        ends = np.array([w[1] for w in windows], dtype=np.int64)
+        columns = {}
+        for k, v in itemIds.items():
+            ldfs = []
+            for first, last, fn in (self.partitions(k, starts[0], ends[-1]) if windows else []):
+                # skip partitions between the windows
+                pos = np.searchsorted(starts, last, side='right') - 1
+                if pos < 0 or ends[pos] < first:
+                    continue
+                ldfs.append((fn, self._read(fn, None, None)))
+            if ldfs:
+                df = self._newest(ldfs)
+                t = df['time'].values
+                pos = np.searchsorted(starts, t, side='right') - 1
+                df = df[(pos >= 0) & (t <= ends[np.maximum(pos, 0)])]
+                columns[v[0]] = df.set_index('time')['value']
+            else:
+                columns[v[0]] = pd.Series([], index=pd.Index([], name='time', dtype='int64'), dtype='float64')
+        return self._combine(columns)
+
+    def _combine(self, columns):
+        # merge the dataItem columns on 'time'
+        df = pd.concat(columns, axis=1).sort_index()
+        df.index.name = 'time'
+        df = df.reset_index()
+        df['time'] = df['time'].astype('int64')
+        # Addtional Datetime column calculated from timestamp
+        df['datetime'] = pd.to_datetime(df['time'] * 1000000)
+        return df
+
+    def drop(self, itemIds):
+        """remove the stored data of dataItems"""
+        for itemId in itemIds:
+            if os.path.exists(self._dir(itemId)):
+                shutil.rmtree(self._dir(itemId))
+
+
+class MessageStore:
+    """
+    Append only store for the messages (operational messages, warnings & alarms)
+    of one engine.
+
+    layout:
+    <basedir>/messages/meta.json
+    <basedir>/messages/<first ms>_<last ms>.pkl
+
+    messages are kept sorted by timestamp, oldest message first. 
+    meta.json holds the high water mark, the timestamp of the newest stored message.
+    """
+    _ext = '.pkl'
+    _latency = 3600 # sec, messages may arrive late at Myplant, re-check this period before the high water mark.
+    _keys = ['timestamp', 'name', 'severity']
+
+    def __init__(self, basedir):
+        self._base = os.path.join(basedir, 'messages')
+
+    def partitions(self, t_from=None, t_to=None):
+        """list partition files, optionally filtered by time range
+
+        Returns:
+            list: [(first ms, last ms, filename), ...] sorted by first timestamp
+        """
+        ret = []
+        if not os.path.exists(self._base):
+            return ret
+        for fn in os.listdir(self._base):
+            if not fn.endswith(self._ext):
+                continue
+            first, last = [int(x) for x in fn[:-len(self._ext)].split('_')]
+            if (t_from is not None and last < t_from) or (t_to is not None and first > t_to):
+                continue
+            ret.append((first, last, os.path.join(self._base, fn)))
+        return sorted(ret)
+
+    @property
+    def empty(self):
+        return len(self.partitions()) == 0
+
+    @property
+    def hwm(self):
+        """high water mark, timestamp in ms of the newest stored message or None"""
+        fn = os.path.join(self._base, 'meta.json')
+        if os.path.exists(fn):
+            with open(fn, 'r') as f:
+                return json.load(f)['hwm']
+        return None
+
+    def append(self, messages):
+        """store new messages, messages already in the store are skipped
+
+        Args:
+            messages (pd.DataFrame): messages sorted by timestamp, oldest first
+
+        Returns:
+            int: number of new messages stored
+        """
+        if messages.empty:
+            return 0
+        ldf = messages.sort_values('timestamp', kind='stable')
+        hwm = self.hwm
+        if hwm is not None:
+            # skip messages in the overlapping period that are already stored.
+            first = int(ldf['timestamp'].iloc[0])
+            stored = self.read(first, hwm)
+            if not stored.empty:
+                keys = [k for k in self._keys if k in ldf.columns and k in stored.columns]
+                known = set(stored[keys].itertuples(index=False, name=None))
+                ldf = ldf[[t not in known for t in ldf[keys].itertuples(index=False, name=None)]]
+            if ldf.empty:
+                return 0
+        os.makedirs(self._base, exist_ok=True)
+        first, last = int(ldf['timestamp'].iloc[0]), int(ldf['timestamp'].iloc[-1])
+        fn = os.path.join(self._base, f"{first}_{last}{self._ext}")
+        ldf.reset_index(drop=True).to_pickle(fn + '.tmp')
+        os.replace(fn + '.tmp', fn)
+        mfn = os.path.join(self._base, 'meta.json')
+        with open(mfn + '.tmp', 'w') as f:
+            json.dump({'hwm': max(last, hwm or 0)}, f)
+        os.replace(mfn + '.tmp', mfn)
+        return ldf.shape[0]
+
+    def read(self, t_from=None, t_to=None):
+        """read the messages of a time range
+
+        Args:
+            t_from (int, optional): first timestamp in ms. Defaults to None.
+            t_to (int, optional): last timestamp in ms. Defaults to None.
+
+        Returns:
+            pd.DataFrame: messages sorted by timestamp, oldest first
+        """
+        ldfs = [pd.read_pickle(fn) for _, _, fn in self.partitions(t_from, t_to)]
+        if not ldfs:
+            return pd.DataFrame([])
+        df = pd.concat(ldfs, ignore_index=True).sort_values('timestamp', kind='stable')
+        # select the time range on the sorted timestamp index
+        ts = df['timestamp'].values
+        i0 = np.searchsorted(ts, t_from, side='left') if t_from is not None else 0
+        i1 = np.searchsorted(ts, t_to, side='right') if t_to is not None else len(ts)
+        return df.iloc[i0:i1].reset_index(drop=True)
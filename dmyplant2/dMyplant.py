@@ -3,23 +3,76 @@ import arrow
 import json
 import base64
 import requests
+from requests.adapters import HTTPAdapter
 import logging
 import os
+import random
 import sys
+import threading
 from datetime import datetime, timedelta
 from tqdm.auto import tqdm
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from itertools import islice
 import time
 import pickle
 import pandas as pd
 import numpy as np
 from pprint import pprint as pp
+from dmyplant2.dResponseCache import ResponseCache
 
 try:
     import httplib # type: ignore comment;
 except:
     import http.client as httplib
 
+try:
+    import orjson # type: ignore comment;
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
 maxdatapoints = 100000  # Datapoints per request, limited by Myplant
+retry_status = {429, 500, 502, 503, 504} # transient errors, retried with backoff
+
+def hist_chunks(lp_from, lp_end, rows_per_request, timeCycle):
+    """Split a history request into windows within the Myplant datapoint limit
+
+    Args:
+        lp_from (int): start timestamp in ms
+        lp_end (int): stop timestamp in ms
+        rows_per_request (int): max. number of rows per request
+        timeCycle (int): interval in seconds
+
+    Returns:
+        list: [(lp_from, lp_to), ...] request windows in time order
+    """
+    chunks = []
+    lp_to = min(lp_from + rows_per_request * timeCycle * 1000, lp_end)
+    while lp_from < lp_end:
+        chunks.append((lp_from, lp_to))
+        lp_from = lp_to + timeCycle * 1000
+        lp_to = min(lp_to + rows_per_request * timeCycle * 1000, lp_end)
+    return chunks
+
+def hist_alarms_url(assetId, p_severities=[500, 600, 650, 700, 800], p_offset=0, p_limit=None, p_from=None, p_to=None):
+    """url of a /history/alarms request, either limit or from & to are required, see Engine.batch_hist_alarms"""
+    tt = r""
+    if p_from is not None and p_to is not None:
+        tt = r'&from=' + str(int(arrow.get(p_from).timestamp()) * 1000) + \
+            r'&to=' + str(int(arrow.get(p_to).timestamp()) * 1000)
+    if p_limit:
+        tt += r"&offset=" + str(p_offset) + \
+            r"&limit=" + str(p_limit)
+    if not tt:
+        raise Exception(
+            r"batch_hist_alarms, invalid Parameters")
+
+    tsvj = ','.join([str(s) for s in p_severities])
+
+    return r'/asset/' + str(assetId) + \
+        r'/history/alarms' + \
+        r'?severities=' + str(tsvj) + tt
 
 def save_json(fil, d):
     with open(fil, 'w') as f:
@@ -39,6 +92,38 @@ def load_pkl(fil):
         return pickle.load(f)
 
 
+def decode_batchdata(content, itemIds):
+    """Decode a /history/batchdata response into a DataFrame
+
+    the values of all rows are read in one pass into a float64 matrix, the columns
+    are slices of it. int64 ms timestamps, object columns for non numeric dataItems.
+
+    Args:
+        content (bytes or dict): raw response content or already parsed response
+        itemIds (dict): DataItem Id's, Names & Units, e.g. {161: ['CountOph','h']}
+
+    Returns:
+        pd.DataFrame: 'time', <dataItem names> ...
+    """
+    ldata = json_loads(content) if isinstance(content, (bytes, str)) else content
+    itemIds = { int(k):v for (k,v) in itemIds.items() }
+    rows = ldata['data']
+    names = [itemIds[int(k)][0] for k in ldata['columns'][1]]
+    cols = {'time': np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))}
+    try:
+        values = np.fromiter((c[0] for r in rows for c in r[1]), dtype=np.float64,
+            count=len(rows) * len(names)).reshape(len(rows), len(names))
+        for j, name in enumerate(names):
+            cols[name] = values[:, j]
+    except (TypeError, ValueError): # non numeric dataItems, column by column
+        for j, name in enumerate(names):
+            values = [r[1][j][0] for r in rows]
+            try:
+                cols[name] = np.array(values, dtype=np.float64)
+            except (TypeError, ValueError):
+                cols[name] = np.array(values, dtype=object)
+    return pd.DataFrame(cols)
+
 def epoch_ts(ts) -> float:
     try:
         if ts >= 10000000000.0:
@@ -58,7 +143,93 @@ def mp_ts(ts) -> int:
         return 0.0
 
 class MyPlantException(Exception):
-    pass
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code # HTTP status of the failed request, None => connection error or timeout
+
+def endpoint_family(url):
+    """endpoint family of a request url: 'batchdata', 'alarms', 'reports' or 'asset'"""
+    if '/history/batchdata' in url:
+        return 'batchdata'
+    if '/history/alarms' in url:
+        return 'alarms'
+    if '/report' in url:
+        return 'reports'
+    return 'asset'
+
+class TokenBucket:
+    """thread safe token bucket, rate tokens per second, bursts up to burst tokens"""
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, rate))
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1.0):
+        """take tokens, blocks until they are available
+
+        Returns:
+            float: seconds waited
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= tokens
+            # a negative balance is the wait time of this caller, later callers queue behind it
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+class RequestStats:
+    """thread safe request counters & latency histograms per endpoint family"""
+    latency_buckets = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float('inf')] # upper bounds in seconds
+    _counters = ['requests', 'errors', 'retries', 'bytes', 'datapoints', 'latency', 'throttled', 'cache_hits']
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+        self._hist = {}
+        self._status = {}
+
+    def _family(self, family):
+        if family not in self._data:
+            self._data[family] = dict.fromkeys(self._counters, 0)
+            self._hist[family] = np.zeros(len(self.latency_buckets), dtype=np.int64)
+            self._status[family] = {}
+        return self._data[family]
+
+    def record(self, family, status, latency, nbytes=0, throttled=0.0):
+        """count a request, status 0 => connection error or timeout"""
+        with self._lock:
+            d = self._family(family)
+            d['requests'] += 1
+            d['errors'] += int(status not in (200, 304)) # 304 => revalidated cache entry
+            d['bytes'] += nbytes
+            d['latency'] += latency
+            d['throttled'] += throttled
+            self._hist[family][np.searchsorted(self.latency_buckets, latency)] += 1
+            self._status[family][status] = self._status[family].get(status, 0) + 1
+
+    def add(self, family, counter, n=1):
+        with self._lock:
+            self._family(family)[counter] += n
+
+    def frame(self):
+        """counters per endpoint family"""
+        with self._lock:
+            df = pd.DataFrame.from_dict(self._data, orient='index', columns=self._counters)
+            status = {f:dict(v) for f,v in self._status.items()}
+        df['latency_avg'] = df['latency'] / df['requests'].where(df['requests'] > 0)
+        df['status'] = pd.Series(status)
+        return df.rename(columns={'latency':'latency_sum', 'throttled':'throttled_sum'})
+
+    def histogram(self):
+        """latency histogram per endpoint family, columns are the bucket upper bounds [s]"""
+        with self._lock:
+            return pd.DataFrame.from_dict({f:h.copy() for f,h in self._hist.items()}, orient='index', columns=self.latency_buckets)
 
 burl = 'https://api.myplant.io'
 errortext = {
@@ -89,18 +260,56 @@ class MyPlant:
     _password = ''
     _session = None
     _caching = 0
+    _pool_maxsize = 16
+    _timeout = (10, 120)   # (connect, read) seconds
+    _retries = 5
+    _backoff = 1.0
+    _max_backoff = 60.0
+    _rate_limits = {}      # endpoint family => (rate, burst)
+    _buckets = None
+    _stats = None
+    _response_caching = True
+    _cache_size = 500 * 2**20
+    _cache = None
 
     _dfn = 'data/dataitems.pkl'
     _dataitems = pd.DataFrame([])
+    _fleet = None
+    _assets = None
+    _login_lock = threading.RLock()
+
+    def __init__(self, caching=0, pool_maxsize=16, timeout=(10, 120), retries=5, backoff=1.0, max_backoff=60.0, rate_limits=None,
+                 response_cache=True, cache_size=500 * 2**20):
+        """MyPlant Constructor
 
-    def __init__(self, caching=0):
-        """MyPlant Constructor"""
+        Args:
+            caching (int, optional): cache time. Defaults to 0.
+            pool_maxsize (int, optional): max. number of pooled connections, >= number of concurrent fetchers. Defaults to 16.
+            timeout (tuple, optional): (connect, read) timeout in seconds. Defaults to (10, 120).
+            retries (int, optional): retries of 429/5xx responses and connection errors. Defaults to 5.
+            backoff (float, optional): base of the exponential backoff in seconds. Defaults to 1.0.
+            max_backoff (float, optional): max. backoff in seconds. Defaults to 60.0.
+            rate_limits (dict, optional): {endpoint family: rate or (rate, burst)}, requests per second
+                for 'batchdata', 'alarms', 'asset' and 'reports', see set_rate_limit. Defaults to None.
+            response_cache (bool, optional): cache static responses in data/cache, see dResponseCache. Defaults to True.
+            cache_size (int, optional): max. size of the response cache in bytes. Defaults to 500MB.
+        """
         if not have_internet():
             raise Exception("Error, Check Internet Connection!")
 
         self._data_basedir = os.getcwd() + f'/data'
 
         self._caching = caching
+        self._pool_maxsize = pool_maxsize
+        self._timeout = timeout
+        self._retries = retries
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._response_caching = response_cache
+        self._cache_size = cache_size
+        self._rate_limits = {}
+        for family, limit in (rate_limits or {}).items():
+            self.set_rate_limit(family, *(limit if isinstance(limit, (tuple, list)) else (limit,)))
         # load and manage credentials from hidden file
         try:
             with open("./data/.credentials", "r", encoding='utf-8-sig') as file:
@@ -117,6 +326,78 @@ class MyPlant:
         # store dataitems in class variable at start
         self.load_dataitems()        
 
+    def __getstate__(self):
+        # e.g. Engine instances passed to worker processes, every process logs in with its own session.
+        state = self.__dict__.copy()
+        state.pop('_session', None)
+        state.pop('_fleet', None)
+        state.pop('_assets', None)
+        # token buckets & statistics are per process, the rate limits are kept.
+        state.pop('_buckets', None)
+        state.pop('_stats', None)
+        state.pop('_cache', None)
+        return state
+
+    def _response_cache(self):
+        # on disk cache of the static routes, None if disabled
+        if self._cache is None and self._response_caching and getattr(self, '_data_basedir', None):
+            with self._login_lock:
+                if self._cache is None:
+                    self._cache = ResponseCache(self._data_basedir + '/cache', max_size=self._cache_size)
+        return self._cache
+
+    def clear_response_cache(self):
+        cache = self._response_cache()
+        if cache is not None:
+            cache.clear()
+
+    def set_rate_limit(self, family, rate, burst=None):
+        """limit the requests of an endpoint family
+
+        Args:
+            family (str): 'batchdata', 'alarms', 'asset' or 'reports'
+            rate (float): requests per second, None => unlimited
+            burst (float, optional): max. burst of requests. Defaults to max(1, rate).
+        """
+        with self._login_lock:
+            limits = dict(self._rate_limits)
+            if rate:
+                limits[family] = (rate, burst)
+            else:
+                limits.pop(family, None)
+            self._rate_limits = limits
+            self._buckets = None # rebuilt with the next request
+
+    def _bucket(self, family):
+        buckets = self._buckets
+        if buckets is None:
+            with self._login_lock:
+                if self._buckets is None:
+                    self._buckets = {f:TokenBucket(*limit) for f, limit in self._rate_limits.items()}
+                buckets = self._buckets
+        return buckets.get(family)
+
+    def _request_stats(self):
+        if self._stats is None:
+            with self._login_lock:
+                if self._stats is None:
+                    self._stats = RequestStats()
+        return self._stats
+
+    @property
+    def stats(self):
+        """request counters per endpoint family: requests, errors, retries, bytes, datapoints,
+        latency & throttle time [s], cache hits and the HTTP status codes"""
+        return self._request_stats().frame()
+
+    @property
+    def latency_histogram(self):
+        """request latency histogram per endpoint family, columns are the bucket upper bounds [s]"""
+        return self._request_stats().histogram()
+
+    def reset_stats(self):
+        self._stats = None
+
     def del_Credentials(self):
             os.remove("./data/.credentials")
 
@@ -235,11 +516,83 @@ class MyPlant:
     def username(self):
         return self.deBase64(self._name)
 
+    def _new_session(self):
+        # pooled session, shared by concurrent fetchers
+        session = requests.session()
+        adapter = HTTPAdapter(pool_connections=self._pool_maxsize, pool_maxsize=self._pool_maxsize, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+        return session
+
+    def _backoff_time(self, attempt, response=None):
+        # exponential backoff with full jitter, a Retry-After header of the server takes precedence
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self._max_backoff)
+        return random.uniform(0, min(self._max_backoff, self._backoff * 2 ** attempt))
+
+    def _relogin(self, session):
+        # token expired, replace the session unless a concurrent fetcher did already.
+        # the old session is not closed, other requests might still use it.
+        with self._login_lock:
+            if self._session is session:
+                self._session = None
+            self.login()
+
+    def _request(self, method, url, **kwargs):
+        """HTTP request with timeouts, transient errors are retried with backoff,
+        an expired token (401) is renewed once.
+
+        Returns:
+            requests.Response: the last response, status code not in retry_status
+
+        Raises:
+            MyPlantException: retries exhausted
+        """
+        kwargs.setdefault('timeout', self._timeout)
+        family = endpoint_family(url)
+        bucket = self._bucket(family)
+        stats = self._request_stats()
+        relogin = True
+        attempt = 0
+        while attempt <= self._retries:
+            throttled = bucket.acquire() if bucket is not None else 0.0
+            t0 = time.monotonic()
+            session = self._session
+            try:
+                response = session.request(method, burl + url, **kwargs)
+                stats.record(family, response.status_code, time.monotonic() - t0, len(response.content), throttled)
+                if response.status_code == 401 and relogin:
+                    logging.warning(f"{url}: 401, login again")
+                    relogin = False
+                    self._relogin(session)
+                    continue
+                if response.status_code not in retry_status:
+                    return response
+                err = f"{response.status_code}, {errortext.get(response.status_code,'no HTTP Error text available.')}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                stats.record(family, 0, time.monotonic() - t0, 0, throttled)
+                response = None
+                err = str(e)
+            if attempt < self._retries:
+                stats.add(family, 'retries')
+                wait = self._backoff_time(attempt, response)
+                logging.warning(f"{url}: {err}, retry #{attempt + 1} in {wait:.1f}s")
+                time.sleep(wait)
+            attempt += 1
+        raise MyPlantException(f"{url}: {err}, giving up after {self._retries} retries",
+            response.status_code if response is not None else None)
+
     def login(self):
         """Login to MyPlant"""
-        if self._session is None:
+        if self._session is not None:
+            return
+        with self._login_lock: # concurrent fetchers login only once
+            if self._session is not None:
+                return
             logging.debug(f"SSO {self.deBase64(self._name)} MyPlant login")
-            self._session = requests.session()
+            session = self._new_session()
             headers = {'Content-Type': 'application/json', }
             body = {
                 "username": self.deBase64(self._name),
@@ -248,8 +601,8 @@ class MyPlant:
             loop = 1
             try:
                 while loop < 3:
-                    response = self._session.post(burl + "/auth",
-                                                  data=json.dumps(body), headers=headers)
+                    response = session.post(burl + "/auth",
+                                                  data=json.dumps(body), headers=headers, timeout=self._timeout)
                     if response.status_code == 200:
                         logging.debug(f'login {self._name} successful.')
                         break
@@ -263,6 +616,8 @@ class MyPlant:
                     logging.error(f'Login {self.deBase64(self._name)} failed')
                     raise Exception(
                         f'Login {self.deBase64(self._name)} failed')
+                # publish the session only after a successful login
+                self._session = session
                     
             except:
                 self.del_Credentials()
@@ -274,18 +629,75 @@ class MyPlant:
             self._session.close()
             self._session = None
 
-    def fetchdata(self, url):
-        """login and return data based on url"""
+    @staticmethod
+    def _http_error(url, response):
+        err = f"{url}: {response.status_code}, {errortext.get(response.status_code,'no HTTP Error text available.')}"
+        logging.error(f"Code: {err}")
+        return MyPlantException(err, response.status_code)
+
+    def fetchraw(self, url):
+        """login and return the raw response content based on url
+
+        Raises:
+            MyPlantException: HTTP error, e.g. 404 or retries exhausted
+        """
         self.login()
         logging.debug(f'url: {url}')
-        response = self._session.get(burl + url)
+        response = self._request('GET', url)
         if response.status_code == 200:
             logging.debug(f'fetchdata: download successful')
-            res = response.json()
-            return res
-        else:
-            logging.error(
-                f"Code: {url}, {response.status_code}, {errortext.get(response.status_code,'no HTTP Error text available.')}")
+            return response.content
+        raise self._http_error(url, response)
+
+    def _fetch_cached(self, cache, url, ttl):
+        # response content from the cache, stale entries are revalidated with ETag / Last-Modified.
+        key = cache.key(self._name, url)
+        entry = cache.get(key)
+        content = cache.content(entry) if entry is not None else None
+        if content is not None and time.time() - entry['stored'] < ttl:
+            self._request_stats().add(endpoint_family(url), 'cache_hits')
+            return content
+        headers = {}
+        if content is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            self.login()
+            logging.debug(f'url: {url}')
+            response = self._request('GET', url, headers=headers)
+        except MyPlantException as err: # retries exhausted, connection error or timeout
+            if content is None:
+                raise
+            logging.warning(f"{str(err)}, using the cached response of {datetime.fromtimestamp(entry['stored'])}")
+            return content
+        if response.status_code == 304 and content is not None:
+            cache.touch(key, entry)
+            self._request_stats().add(endpoint_family(url), 'cache_hits')
+            return content
+        if response.status_code == 200:
+            cache.put(key, url, response.content, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+            return response.content
+        err = self._http_error(url, response)
+        if content is None:
+            raise err
+        logging.warning(f"{url}: using the cached response of {datetime.fromtimestamp(entry['stored'])}")
+        return content
+
+    def fetchdata(self, url):
+        """login and return data based on url, static routes are served from the response cache
+
+        Raises:
+            MyPlantException: HTTP error, e.g. 404 or retries exhausted
+        """
+        cache = self._response_cache()
+        ttl = cache.ttl(url) if cache is not None else None
+        content = self._fetch_cached(cache, url, ttl) if ttl else self.fetchraw(url)
+        data = json_loads(content)
+        if isinstance(data, list): # e.g. messages
+            self._request_stats().add(endpoint_family(url), 'datapoints', len(data))
+        return data
 
     def _asset_data(self, serialNumber):
         """
@@ -298,8 +710,109 @@ class MyPlant:
         ----------------------------------------------
         url: /asset?assetType=J-Engine&serialNumber=sn
         """
+        if self._assets: # preloaded, see preload_assets
+            asset = self._assets.pop(str(serialNumber), None)
+            if asset is not None:
+                return asset
         return self.fetchdata(url=r"/asset?assetType=J-Engine&serialNumber=" + str(serialNumber))
 
+    @staticmethod
+    def _complete_asset(asset):
+        # a bulk record replaces the single asset request only if Engine finds all it needs
+        return (isinstance(asset, dict) and all(k in asset for k in ['id', 'serialNumber', 'status'])
+            and all(isinstance(asset.get(k), list) and asset[k] and all('name' in i and 'id' in i for i in asset[k])
+                for k in ['properties', 'dataItems']))
+
+    @staticmethod
+    def _covers(asset, reference):
+        # asset has all fields, properties & dataItems of reference
+        return set(reference) <= set(asset) and all(
+            {i['name'] for i in reference.get(k, [])} <= {i['name'] for i in asset.get(k, [])}
+            for k in ['properties', 'dataItems'])
+
+    def _asset_data_bulk(self, serialNumbers, chunksize=100):
+        # full asset records, chunksize serial numbers per /asset/ request.
+        # the list endpoint might deliver selected fields only, the bulk record of the first
+        # engine is compared to its single asset record, incomplete bulk records are dropped.
+        sns = list(dict.fromkeys(str(sn) for sn in serialNumbers))
+        ret = {}
+        for i in range(0, len(sns), chunksize):
+            chunk = sns[i:i + chunksize]
+            url = "/asset/" + \
+                "?serialNumbers=" + ','.join(chunk) + \
+                "&assetTypes=J-Engine" + \
+                f"&limit={len(chunk)}"
+            try:
+                res = self.fetchdata(url)
+            except MyPlantException as err:
+                logging.error(f"bulk asset request failed, {str(err)}")
+                continue
+            for asset in (res or {}).get('data', []):
+                if self._complete_asset(asset) and str(asset['serialNumber']) in chunk:
+                    ret[str(asset['serialNumber'])] = asset
+        if ret:
+            sn = next(iter(ret))
+            reference = self.fetchdata(url=r"/asset?assetType=J-Engine&serialNumber=" + sn)
+            if not self._covers(ret[sn], reference):
+                logging.warning("bulk asset records are incomplete, the assets are fetched one by one")
+                return {}
+            ret[sn] = reference
+        return ret
+
+    def asset_data_bulk(self, serialNumbers, chunksize=100, concurrency=8):
+        """full asset records of many engines in as few requests as possible
+
+        The records are fetched with chunksize serial numbers per /asset/ request and
+        checked against the single asset record of one engine. Engines missing in the 
+        response or incomplete records are fetched one by one, see asset_data_many.
+
+        Returns:
+            dict: {serialNumber: asset}, None for failed requests
+        """
+        ret = self._asset_data_bulk(serialNumbers, chunksize)
+        missing = [str(sn) for sn in serialNumbers if str(sn) not in ret]
+        if missing:
+            logging.debug(f"{len(missing)} assets not in the bulk response, fetched one by one")
+            ret.update(self.asset_data_many(missing, concurrency))
+        return {str(sn): ret.get(str(sn)) for sn in serialNumbers}
+
+    def preload_assets(self, serialNumbers, chunksize=100):
+        """bulk load the asset records for the next Engine instances
+
+        Every preloaded record is used once by _asset_data, engines missing in
+        the bulk response fall back to their single asset request.
+
+        Returns:
+            int: number of preloaded assets
+        """
+        assets = self._asset_data_bulk(serialNumbers, chunksize)
+        self._assets = {**(self._assets or {}), **assets}
+        return len(assets)
+
+    def asset_data_many(self, serialNumbers, concurrency=8, rates=None):
+        """asset data of many engines, concurrent requests, see AsyncMyPlant
+
+        Returns:
+            dict: {serialNumber: asset}, None for failed requests
+        """
+        from dmyplant2.dAsyncMyplant import AsyncMyPlant
+        with AsyncMyPlant(self, concurrency, rates) as amp:
+            return amp.run(amp.asset_data_many(serialNumbers))
+
+    def hist_alarms_many(self, assetIds, concurrency=8, rates=None, **kwargs):
+        """messages of many engines, concurrent requests, see AsyncMyPlant
+
+        Args:
+            assetIds (list): asset id's
+            kwargs: p_severities, p_offset, p_limit, p_from, p_to see Engine.batch_hist_alarms
+
+        Returns:
+            dict: {assetId: pd.DataFrame}, None for failed requests
+        """
+        from dmyplant2.dAsyncMyplant import AsyncMyPlant
+        with AsyncMyPlant(self, concurrency, rates) as amp:
+            return amp.run(amp.hist_alarms_many(assetIds, **kwargs))
+
     def historical_dataItem(self, id, itemId, timestamp):
         """
         url: /asset/{assetId}/dataitem/{dataItemId}
@@ -330,19 +843,23 @@ class MyPlant:
         itemIds = { int(k):v for (k,v) in itemIds.items() }
         # comma separated string of DataItemID's
         IDS = ','.join([str(s) for s in itemIds.keys()])
-        ldata = self.fetchdata(
+        content = self.fetchraw(
             url=fr"/asset/{id}/history/batchdata?from={lp_from}&to={lp_to}&timeCycle={timeCycle}&assetType=J-Engine&includeMinMax=false&forceDownSampling=false&dataItemIds={IDS}")
-        # restructure data to dict
-        ds = dict()
-        ds['labels'] = ['time'] + [itemIds[x][0] for x in ldata['columns'][1]]
-        ds['data'] = [[r[0]] + [rr[0] for rr in r[1]] for r in ldata['data']]
-        # import data to Pandas DataFrame and return result
-        df = pd.DataFrame(ds['data'], columns=ds['labels'])
+        # decode response to Pandas DataFrame and return result
+        df = decode_batchdata(content, itemIds)
+        self._request_stats().add('batchdata', 'datapoints', df.shape[0] * len(itemIds))
         return df
 
-    def hist_data(self, id, itemIds, p_from, p_to, timeCycle=3600, silent=False):
+    def iter_hist_data(self, id, itemIds, p_from, p_to, timeCycle=3600, silent=False, workers=1):
         """
-        url: /asset/{assetId}/dataitem/{dataItemId}
+        Generator, yields the dataItems history chunk by chunk in time order,
+        as soon as each chunk is available. Each chunk is a pd.DataFrame with 
+        'time', <dataItem names> ... and 'datetime' columns.
+
+        e.g.:
+        for ldf in mp.iter_hist_data(id, itemIds, p_from, p_to, timeCycle=1):
+            ldf.to_parquet(...)
+
         Parameters:
         Name	    type            Description
         assetId     int64           Id of the Asset to query the DateItem for.
@@ -350,11 +867,9 @@ class MyPlant:
         p_from      int64           timestamp start timestamp in ms.
         p_to        int64           timestamp stop timestamp in ms.
         timeCycle   int64           interval in seconds.
+        workers     int             number of concurrent requests, defaults to 1 (sequential)
         """
 
-        # initialize a data collector
-        df = pd.DataFrame([])
-
         # calculate how many full rows per request within the myplant limit are possible
         rows_per_request = maxdatapoints // len(itemIds)
         try:
@@ -362,36 +877,69 @@ class MyPlant:
         except:
             print('Please check arrow version! Make sure you have version 1.0.3 or higher installed!')
             print('Update arrow by writing in command prompt: pip install --trusted-host pypi.org --trusted-host files.pythonhosted.org arrow==1.0.3')
-    
-        if not silent:
-            pbar = tqdm(total=rows_total, ncols=80, mininterval=1, unit=' datarows', desc="Load Data")
 
-        # initialize loop
-        lp_from = int(p_from.timestamp()) * 1000  # Start at lp_from
-        lp_to = min((lp_from + rows_per_request * timeCycle * 1000),
-                    int(p_to.timestamp()) * 1000)
-
-        while lp_from < int(p_to.timestamp()) * 1000:
-            # for now assume same itemID's are always included ... need to be included in a check
-            ldf = self._history_batchdata(
-                id, itemIds, lp_from, lp_to, timeCycle)
+        # precalculate all request windows
+        chunks = hist_chunks(
+            int(p_from.timestamp()) * 1000, int(p_to.timestamp()) * 1000, rows_per_request, timeCycle)
+
+        def _chunk(lp_from, lp_to):
+            ldf = self._history_batchdata(id, itemIds, lp_from, lp_to, timeCycle)
+            # Addtional Datetime column calculated from timestamp
+            ldf['datetime'] = pd.to_datetime(ldf['time'] * 1000000)
+            return ldf
+
+        def _results():
+            if workers > 1 and len(chunks) > 1:
+                # login once before the worker threads share the session
+                self.login()
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    # keep a limited number of requests in flight, deliver them in order.
+                    windows = iter(chunks)
+                    pending = deque([executor.submit(_chunk, *w) for w in islice(windows, 2 * workers)])
+                    while pending:
+                        ldf = pending.popleft().result()
+                        w = next(windows, None)
+                        if w:
+                            pending.append(executor.submit(_chunk, *w))
+                        yield ldf
+            else:
+                for w in chunks:
+                    yield _chunk(*w)
 
-            # and append each chunk to the return df
-            #df = df.append(ldf) # 2022-02-19: deprecation warning => use concat in future!
-            df = pd.concat([df, ldf])
-            
-            if not silent:
-                pbar.update(rows_per_request)
-            # calculate next cycle
-            lp_from = lp_to + timeCycle * 1000
-            lp_to = min((lp_to + rows_per_request *
-                        timeCycle * 1000), int(p_to.timestamp()) * 1000)
-        
         if not silent:
-            pbar.close()
-        # Addtional Datetime column calculated from timestamp
-        df['datetime'] = pd.to_datetime(df['time'] * 1000000)
-        return df
+            pbar = tqdm(total=rows_total, ncols=80, mininterval=1, unit=' datarows', desc="Load Data")
+        try:
+            last = None
+            for ldf in _results():
+                # remove double rows at the chunk boundaries
+                if last is not None:
+                    ldf = ldf[ldf['time'] > last]
+                if not ldf.empty:
+                    last = ldf['time'].iloc[-1]
+                if not silent:
+                    pbar.update(rows_per_request)
+                yield ldf
+        finally:
+            if not silent:
+                pbar.close()
+
+    def hist_data(self, id, itemIds, p_from, p_to, timeCycle=3600, silent=False, workers=1):
+        """
+        url: /asset/{assetId}/dataitem/{dataItemId}
+        Parameters:
+        Name	    type            Description
+        assetId     int64           Id of the Asset to query the DateItem for.
+        itemIds     dict            DataItem Id's, Names & Units
+        p_from      int64           timestamp start timestamp in ms.
+        p_to        int64           timestamp stop timestamp in ms.
+        timeCycle   int64           interval in seconds.
+        workers     int             number of concurrent requests, defaults to 1 (sequential)
+        """
+        # collect all chunks and concatenate once.
+        ldfs = list(self.iter_hist_data(id, itemIds, p_from, p_to, timeCycle, silent=silent, workers=workers))
+        if not ldfs:
+            return pd.DataFrame([], columns=['time'] + [v[0] for v in itemIds.values()] + ['datetime'])
+        return pd.concat(ldfs)
 
     def stitch_df(self, **dataframes):
         """Stitch Dataframes together
@@ -476,14 +1024,16 @@ class MyPlant:
         return fleet
 
     def reload_installed_fleet(self):
-        self._fetch_installed_base()
+        self._fleet = self._fetch_installed_base()
 
     def get_installed_fleet(self):
-        if os.path.exists(self._data_basedir + '/Installed_base.pkl'):
-            fleet = pd.read_pickle(self._data_basedir + '/Installed_base.pkl')
-        else:
-            fleet= self._fetch_installed_base()
-        return fleet
+        # load the installed fleet table only once per MyPlant instance
+        if self._fleet is None:
+            if os.path.exists(self._data_basedir + '/Installed_base.pkl'):
+                self._fleet = pd.read_pickle(self._data_basedir + '/Installed_base.pkl')
+            else:
+                self._fleet = self._fetch_installed_base()
+        return self._fleet
 
     def search_installed_fleet_by_contains_name(self, name):
         def sfun(x):
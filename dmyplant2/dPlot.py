@@ -29,7 +29,7 @@ from bokeh.layouts import column, row, gridplot, layout
 from bokeh.models import ColumnDataSource, Div, Span
 
 # Load Application imports
-from dmyplant2.dReliability import demonstrated_reliability_sr
+from dmyplant2.dReliability import demonstrated_reliability_sr, oph_matrix
 import dmyplant2
 
 def v(mp, dset):
@@ -836,9 +836,11 @@ def demonstrated_Reliabillity_Plot(vl, beta=1.21, T=30000, s=1000, ft=pd.DataFra
 
     fcol = 'grey'
 
-    # calculate the x axis timerange first
-    tr = demonstrated_reliability_sr(vl,
-                                     start_ts, last_ts, beta=beta, size=s, ft=ft)[0]  # timestamp x axis start .. end
+    # calculate the x axis timerange and the demonstrated reliability curves for the complete period,
+    # all confidence intervals CL in one pass:
+    tr, rels, _ = demonstrated_reliability_sr(vl, start_ts, last_ts,
+                                          CL=[c/100.0 for c in cl], beta=beta, size=s, ft=ft, T=T)
+    rel = {c: rels[i] for i, c in enumerate(cl)}
 
     # determine the array - index of 'now'
     n_i = _idx(s, start_ts, last_ts, vl.now_ts)
@@ -848,11 +850,6 @@ def demonstrated_Reliabillity_Plot(vl, beta=1.21, T=30000, s=1000, ft=pd.DataFra
 
     # convert to datetime dates - start .. last
     dtr = [datetime.fromtimestamp(t) for t in tr]
-    # calculate demonstrated reliability curves for the complete period,
-    # confidence intervals CL :
-    rel = {c: demonstrated_reliability_sr(vl, start_ts, last_ts,
-                                          CL=c/100.0, beta=beta, size=s, ft=ft, T=T)[1] for c in cl}
-
     # convert to datetime dates - start .. now
     n_dtr = [datetime.fromtimestamp(t) for t in n_tr]
     # copy demontrated reliability values for the validation period up to now:
@@ -904,14 +901,13 @@ def demonstrated_Reliabillity_Plot(vl, beta=1.21, T=30000, s=1000, ft=pd.DataFra
     ax2.yaxis.set_major_locator(ticker.LinearLocator(13))
 
     # and plot the linearized engine runtime lines vs the 2nd axis
-    for e in vl.engines[:]:
+    oph2 = oph_matrix(vl, tr, method='oph2')
+    for e, y in zip(vl.engines, oph2):
         # print(e.Name, e['Engine ID'], e['val start'], e['oph parts'])
         # complete interval in color fcal
-        y = [e.oph2(t) for t in tr]
         ax2.plot(dtr, y, linewidth=0.5, color=fcol)
         # the current validation interval in multiple colors
-        n_y = [e.oph2(t) for t in n_tr]
-        ax2.plot(n_dtr, n_y, label=f"{e.Name} {e['Engine ID']}")
+        ax2.plot(n_dtr, y[0:n_i:1], label=f"{e.Name} {e['Engine ID']}")
 
     # NOW plot some Orientation Lines and Test into the Plot
 
@@ -18,36 +18,122 @@ def lipson_equality(p, t1, t2, beta) -> float:
     return (nl, pl)
 
 
+def oph_matrix(val, t_arr, method='oph'):
+    """interpolated operating hours of all validation engines at all time points
+
+    Args:
+        val (dmyplant2.Validation): validation fleet
+        t_arr (np.ndarray): EPOCH timestamps
+        method (str, optional): 'oph' or 'oph2', see Engine.oph. Defaults to 'oph'.
+
+    Returns:
+        np.ndarray: (engines x time points) operating hours
+    """
+    slope = '_k' if method == 'oph' else '_k2'
+    k = np.array([getattr(e, slope, 0.0) for e in val.engines], dtype=np.float64)
+    vs = np.array([e.valstart_ts for e in val.engines], dtype=np.float64)
+    return np.maximum(k[:, None] * (np.asarray(t_arr, dtype=np.float64)[None, :] - vs[:, None]), 0.0)
+
+
+def _failures(t_arr, ft):
+    # number of failures vs time, based on the failures DataFrame (date, failures, ...)
+    f_arr = np.zeros(len(t_arr))
+    if not(ft.empty):
+        for row in ft.values:
+            f_arr += np.where(t_arr > row[0].timestamp(), row[1], 0)
+    return f_arr
+
+
+def _demonstrated_reliability(tt, m, f_arr, beta, CL, T):
+    # demonstrated reliability for the OPH matrix tt (engines x time), CL array => (CL x time)
+    tt_max = tt.max(axis=0, initial=0.0)
+    valid = tt_max > 0.0 # avoid division by zero
+    dr = np.zeros((len(CL), tt.shape[1]))
+    if valid.any():
+        ttv = tt[:, valid]; ttv_max = tt_max[valid]
+        # sum all part's per lipson equality to max hours at time t
+        n_lip = (m[:, None] * (ttv / ttv_max) ** beta).sum(axis=0)
+        # use Lipson equality again to calc n@T hours
+        n_lip_T = n_lip * ((ttv_max / T) ** beta)
+        # calc demonstrated Reliability per Chi.square dist (see A.Kleyner Paper),
+        # chi2.ppf once per CL and distinct number of failures
+        f_unique, f_idx = np.unique(f_arr[valid], return_inverse=True)
+        ppf = chi2.ppf(np.asarray(CL, dtype=np.float64)[:, None], 2*(f_unique[None, :]+1))
+        dr[:, valid] = np.exp(-ppf[:, f_idx] / (2*n_lip_T)) * 100.0
+    return dr
+
+
 def demonstrated_reliability_sr(val, start, end, beta=1.21, CL=0.9, T=30000, ft=pd.DataFrame, size=10):
-    # failures array
-    f_arr = np.zeros(size)
+    """demonstrated reliability of the validation fleet vs time
+
+    Args:
+        val (dmyplant2.Validation): validation fleet
+        start, end (float): EPOCH timestamps of the time range
+        beta (float, optional): Weibull beta parameter. Defaults to 1.21.
+        CL (float or list, optional): confidence level(s). Defaults to 0.9.
+        T (int, optional): runtime for the assessment of the reliability. Defaults to 30000.
+        ft (pd.DataFrame, optional): observed failures, columns date;failures. Defaults to pd.DataFrame.
+        size (int, optional): number of time points. Defaults to 10.
+
+    Returns:
+        tuple: time points, demonstrated reliability [%] (one row per CL for a list of CLs), failures
+    """
     # time points array
     t_arr = np.linspace(start, end, size)
+    # failures array
+    f_arr = _failures(t_arr, ft)
 
-    # populate the number of failures vs time array
-    # based on failures Dataframe information
-    if not(ft.empty):
-        for row in ft.values:
-            fl = np.where(t_arr > row[0].timestamp(), row[1], 0)
-            f_arr += fl
-
-    # initialize demonstrated Reliability vs. time array
-    dr_arr = []
-
-    # exeecute the algorithm
-    m = np.array([e.Cylinders for e in val.engines])
-    for i, t in enumerate(t_arr):
-        tt = np.array([e.oph(t) for e in val.engines])
-        tt_max = max(tt)
-        if tt_max > 0.0:  # avoid division by zero
-            # sum all part's per lipson equality to max hours at time t
-            n_lip = sum(m*(tt/tt_max) ** beta)
-            # use Lipson equality again to calc n@T hours
-            n_lip_T = n_lip * ((tt_max/T) ** beta)
-            # calc demonstrated Reliability per Chi.square dist (see A.Kleyner Paper)
-            dr = np.exp(-chi2.ppf(CL, 2*(f_arr[i]+1))/(2*n_lip_T)) * 100.0
-            # store in list for numpy vector
-            dr_arr.append(dr)
-        else:
-            dr_arr.append(0.0)
-    return (t_arr, np.array(dr_arr), f_arr)
+    m = np.array([e.Cylinders for e in val.engines], dtype=np.float64)
+    dr = _demonstrated_reliability(oph_matrix(val, t_arr), m, f_arr, beta, np.atleast_1d(CL), T)
+    return (t_arr, dr if np.ndim(CL) else dr[0], f_arr)
+
+
+def demonstrated_reliability_sweep(val, start, end, beta=[1.21], T=[30000], CL=[0.9], ft=pd.DataFrame, size=1000, chunksize=500):
+    """demonstrated reliability vs time for all combinations of beta, T and CL
+
+    the OPH matrix is calculated once per chunk of time points, chunksize limits
+    the memory to (engines x chunksize) for the OPH matrix and (T x CL x chunksize)
+    for the intermediate results.
+
+    Args:
+        val (dmyplant2.Validation): validation fleet
+        start, end (float): EPOCH timestamps of the time range
+        beta (list, optional): Weibull beta parameters. Defaults to [1.21].
+        T (list, optional): runtimes for the assessment of the reliability. Defaults to [30000].
+        CL (list, optional): confidence levels. Defaults to [0.9].
+        ft (pd.DataFrame, optional): observed failures, columns date;failures. Defaults to pd.DataFrame.
+        size (int, optional): number of time points. Defaults to 1000.
+        chunksize (int, optional): number of time points per chunk. Defaults to 500.
+
+    Returns:
+        pd.DataFrame: demonstrated reliability [%], index (beta, T, CL), columns EPOCH timestamps
+    """
+    beta = np.atleast_1d(np.asarray(beta, dtype=np.float64))
+    T = np.atleast_1d(np.asarray(T, dtype=np.float64))
+    CL = np.atleast_1d(np.asarray(CL, dtype=np.float64))
+    t_arr = np.linspace(start, end, size)
+    f_arr = _failures(t_arr, ft)
+    m = np.array([e.Cylinders for e in val.engines], dtype=np.float64)
+
+    # chi2.ppf once per CL and distinct number of failures
+    f_unique, f_idx = np.unique(f_arr, return_inverse=True)
+    ppf = chi2.ppf(CL[:, None], 2*(f_unique[None, :]+1))
+
+    dr = np.zeros((len(beta), len(T), len(CL), size))
+    for c0 in range(0, size, chunksize):
+        c1 = min(c0 + chunksize, size)
+        tt = oph_matrix(val, t_arr[c0:c1])
+        tt_max = tt.max(axis=0, initial=0.0)
+        valid = np.flatnonzero(tt_max > 0.0) # avoid division by zero
+        if not len(valid):
+            continue
+        ratio = tt[:, valid] / tt_max[valid]
+        cppf = ppf[:, f_idx[c0 + valid]]
+        for i, b in enumerate(beta):
+            # Lipson equality to max hours at time t, then to T hours
+            n_lip = (m[:, None] * ratio ** b).sum(axis=0)
+            n_lip_T = n_lip[None, :] * (tt_max[valid][None, :] / T[:, None]) ** b
+            dr[i][:, :, c0 + valid] = np.exp(-cppf[None, :, :] / (2*n_lip_T[:, None, :])) * 100.0
+
+    index = pd.MultiIndex.from_product([beta, T, CL], names=['beta', 'T', 'CL'])
+    return pd.DataFrame(dr.reshape(-1, size), index=index, columns=pd.Index(t_arr, name='ts'))
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+# cache time per route in seconds, the first matching pattern counts. Routes without match are not cached.
+# Asset records are not cached, their freshness is controlled by MyPlant.caching (Engine cache).
+default_ttl = [
+    (r'^/model/J-Engine', 7 * 86400),
+    (r'^/system/localization', 7 * 86400),
+    (r'^/asset/\d+/report/Oil', 86400),     # oil report overview
+    (r'^/report/sample/Oil/', 365 * 86400), # lab reports don't change
+]
+
+class ResponseCache:
+    """content addressed on disk cache of MyPlant responses
+
+    basedir/objects/<sha256 of content>     response bodies, shared by identical responses
+    basedir/keys/<sha256 of user & url>     metadata: url, object, stored, size, ETag & Last-Modified
+
+    Entries expire after the TTL of their route, stale entries are revalidated with
+    If-None-Match / If-Modified-Since. The least recently used entries are evicted
+    beyond max_size bytes. Every entry is a file of its own, processes may share the cache.
+    """
+    def __init__(self, basedir, max_size=500 * 2**20, ttl=None):
+        self._basedir = basedir
+        self._max_size = max_size
+        self._ttl = [(re.compile(p), t) for p, t in (default_ttl if ttl is None else ttl)]
+        self._lock = threading.Lock()
+        self._size = None       # bytes of the objects, scanned with the first put
+        os.makedirs(os.path.join(basedir, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(basedir, 'keys'), exist_ok=True)
+
+    def ttl(self, url):
+        """cache time of url in seconds, None => not cached"""
+        for pattern, ttl in self._ttl:
+            if pattern.search(url):
+                return ttl
+        return None
+
+    @staticmethod
+    def key(user, url):
+        return hashlib.sha256(f"{user}\n{url}".encode('utf-8')).hexdigest()
+
+    def _keyfile(self, key):
+        return os.path.join(self._basedir, 'keys', key)
+
+    def _objfile(self, sha):
+        return os.path.join(self._basedir, 'objects', sha)
+
+    def get(self, key):
+        """metadata of key, None if not cached. The age is entry['stored'] vs time.time()"""
+        try:
+            with open(self._keyfile(key), 'r') as f:
+                entry = json.load(f)
+            os.utime(self._keyfile(key)) # LRU, the mtime of the key file is the last access
+            return entry
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def content(self, entry):
+        """response body of entry, None if the object is gone"""
+        try:
+            with open(self._objfile(entry['object']), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, fn, data, mode='w'):
+        # atomic replace, readers never see partial files
+        tmp = f"{fn}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, mode) as f:
+            f.write(data)
+        os.replace(tmp, fn)
+
+    def put(self, key, url, content, etag=None, last_modified=None):
+        """store a response body"""
+        sha = hashlib.sha256(content).hexdigest()
+        new_object = not os.path.exists(self._objfile(sha))
+        if new_object:
+            self._write(self._objfile(sha), content, 'wb')
+        entry = {'url': url, 'object': sha, 'stored': time.time(), 'size': len(content), 'etag': etag, 'last_modified': last_modified}
+        self._write(self._keyfile(key), json.dumps(entry))
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            elif new_object:
+                self._size += len(content)
+            if self._size > self._max_size:
+                self._evict()
+
+    def touch(self, key, entry):
+        """revalidated by the server (304), the entry is fresh again"""
+        entry['stored'] = time.time()
+        self._write(self._keyfile(key), json.dumps(entry))
+
+    def _scan_size(self):
+        objdir = os.path.join(self._basedir, 'objects')
+        return sum(os.path.getsize(os.path.join(objdir, fn)) for fn in os.listdir(objdir) if not fn.endswith('.tmp'))
+
+    def _evict(self):
+        # drop the least recently used keys down to 80% of max_size, then the objects without keys.
+        keydir = os.path.join(self._basedir, 'keys')
+        keys = []
+        for fn in os.listdir(keydir):
+            if fn.endswith('.tmp'):
+                continue
+            try:
+                with open(os.path.join(keydir, fn), 'r') as f:
+                    keys.append((os.path.getmtime(os.path.join(keydir, fn)), fn, json.load(f)['object']))
+            except (FileNotFoundError, ValueError, KeyError):
+                pass
+        keys.sort()
+        sizes = {}
+        for _, _, sha in keys:
+            if sha not in sizes and os.path.exists(self._objfile(sha)):
+                sizes[sha] = os.path.getsize(self._objfile(sha))
+        refs = {}
+        for _, _, sha in keys:
+            refs[sha] = refs.get(sha, 0) + 1
+        objdir = os.path.join(self._basedir, 'objects')
+        for sha in os.listdir(objdir): # objects without keys
+            if sha not in refs and not sha.endswith('.tmp'):
+                try:
+                    os.remove(os.path.join(objdir, sha))
+                except FileNotFoundError:
+                    pass
+        size = sum(sizes.values())
+        for _, fn, sha in keys:
+            if size <= 0.8 * self._max_size:
+                break
+            try:
+                os.remove(os.path.join(keydir, fn))
+            except FileNotFoundError:
+                pass
+            refs[sha] -= 1
+            if refs[sha] == 0 and sha in sizes:
+                try:
+                    os.remove(self._objfile(sha))
+                except FileNotFoundError:
+                    pass
+                size -= sizes[sha]
+        self._size = size
+
+    def clear(self):
+        """remove all entries"""
+        with self._lock:
+            for sub in ['keys', 'objects']:
+                d = os.path.join(self._basedir, sub)
+                for fn in os.listdir(d):
+                    try:
+                        os.remove(os.path.join(d, fn))
+                    except FileNotFoundError:
+                        pass
+            self._size = 0
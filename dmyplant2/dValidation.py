@@ -4,8 +4,8 @@ from numpy.lib.arraypad import _pad_dispatcher
 from numpy.testing._private.utils import build_err_msg
 import pandas as pd
 import numpy as np
-import sys
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from dmyplant2.dEngine import Engine
 from dmyplant2.dMyplant import MyPlant, load_pkl, save_pkl
 from pprint import pprint as pp
@@ -64,18 +64,22 @@ class Validation:
     _dash = None
     _val = None
     _engines = []
+    _failed = {}
 
     @classmethod
-    def from_dval(cls, mp, dval, lengine=Engine, eval_date=None, cui_log=False):
+    def from_dval(cls, mp, dval, lengine=Engine, eval_date=None, cui_log=False, workers=1, preload=True):
 
-        return cls(mp,dval, lengine, eval_date, cui_log)
+        return cls(mp,dval, lengine, eval_date, cui_log, workers, preload)
 
-    def __init__(self, mp, dval, lengine=Engine, eval_date=None, cui_log=False):
+    def __init__(self, mp, dval, lengine=Engine, eval_date=None, cui_log=False, workers=1, preload=True):
         """ Myplant Validation object
             collects and provides the engines list.
             compiles a dashboard as pandas DataFrame
             dval ... Pandas DataFrame with the Validation Definition,
                      defined in Excel sheet 'validation'
+            workers ... number of threads to create the Engine instances, defaults to 1 (sequential)
+            preload ... fetch the asset records of the engines with an expired local cache 
+                        in bulk requests, see MyPlant.preload_assets
         """
         self._mp = mp
         self._val = dval
@@ -87,23 +91,46 @@ class Validation:
         engines = self._val.to_dict('records')
         # create and initialise all Engine Instances
         self._engines = []
+        self._failed = {}
         if not cui_log:
             pbar = tqdm(total=len(engines))
-            
-        for i, eng in enumerate(engines):
+
+        if preload:
+            mp.preload_assets([eng['serialNumber'] for eng in engines if Engine.asset_data_expired(mp, eng['serialNumber'])])
+
+        def _create(eng):
             try:
-                e = lengine.from_eng(mp, eng)
-            except:
-                print("Engine Instances cannot not be created.")
-                sys.exit(1)
-            self._engines.append(e)
-            log = f"{i:02d} {e}"
-            logging.info(log)
+                return lengine.from_eng(mp, eng), None
+            except Exception as err:
+                return None, err
+
+        if workers > 1:
+            # load the installed fleet table once & login before the threads share mp
+            mp.get_installed_fleet()
+            mp.login()
+            executor = ThreadPoolExecutor(max_workers=workers)
+            results = executor.map(_create, engines)
+        else:
+            results = map(_create, engines)
+
+        # results are delivered in the order of the validation definition
+        for i, (eng, (e, err)) in enumerate(zip(engines, results)):
+            if err is None:
+                self._engines.append(e)
+                log = f"{i:02d} {e}"
+                logging.info(log)
+            else:
+                self._failed[str(eng['serialNumber'])] = err
+                log = f"{i:02d} {eng['serialNumber']} {eng['Validation Engine']}: Engine Instance cannot be created, {str(err)}"
+                logging.error(log)
             if cui_log:
                 print(log)
             else:
-                pbar.update(i)
+                pbar.update(1)
 
+        if workers > 1:
+            executor.shutdown()
+        mp._assets = None # unused records, e.g. engines loaded from their local cache
         if not cui_log:
             pbar.close()
 
@@ -261,6 +288,14 @@ class Validation:
         """
         return self._engines
 
+    @ property
+    def failed_engines(self):
+        """
+        dict of serialNumber: Exception for Engines 
+        that could not be created
+        """
+        return self._failed
+
     def eng_name(self, name):
         """
         Return the Engines containing Name Validation